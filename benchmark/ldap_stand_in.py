@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from ldap3 import Connection, MOCK_SYNC, NONE, Server
+
+path = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.insert(0, os.path.realpath(f"{path}/../dry-dock/lib"))
+
+from ldap_profiler import LdapProfiler  # noqa: E402
+
+BASE_DN = 'OU=Users,DC=benchmark,DC=local'
+GROUP_DN = 'CN=ucp-users,OU=Groups,DC=benchmark,DC=local'
+
+
+class SlowConnection(Connection):
+    # Every search pays a round trip, which is what makes one approach cheaper than the other
+    latency = 0.0
+    # Like Active Directory, at most this many values of an attribute are returned per search, 0 returns all
+    range_size = 0
+
+    def search(self, *args, **kwargs):
+        time.sleep(self.latency)
+
+        requested = {}
+        if self.range_size:
+            for name in kwargs.get('attributes') or []:
+                attr_type, _, requested_range = name.partition(';range=')
+                requested[attr_type] = int(requested_range.partition('-')[0] or 0)
+
+            kwargs['attributes'] = list(requested)
+
+        result = super().search(*args, **kwargs)
+
+        for entry in self.response or []:
+            if entry.get('type') != 'searchResEntry':
+                continue
+
+            for attr_type, low in requested.items():
+                values = entry['attributes'].get(attr_type)
+
+                if not isinstance(values, list) or (low == 0 and len(values) <= self.range_size):
+                    continue
+
+                high = low + self.range_size - 1
+                del entry['attributes'][attr_type]
+                entry['attributes'][f"{attr_type};range={low}-{'*' if high >= len(values) - 1 else high}"] = \
+                    values[low:high + 1]
+
+        return result
+
+
+def stand_in(users, members, latency, range_size=0):
+    connection = SlowConnection(Server('ldap.benchmark.local', get_info=NONE),
+                                user='CN=reader,OU=Users,DC=benchmark,DC=local', password='reader-password',
+                                client_strategy=MOCK_SYNC, auto_range=False)
+    connection.latency = latency
+    connection.range_size = range_size
+
+    connection.strategy.add_entry('CN=reader,OU=Users,DC=benchmark,DC=local',
+                                  {'objectClass': ['person'], 'userPassword': 'reader-password'})
+
+    user_dns = [f"CN=user{number},{BASE_DN}" for number in range(users)]
+    for number, user_dn in enumerate(user_dns):
+        connection.strategy.add_entry(user_dn, {'objectClass': ['person', 'user'],
+                                                'cn': f"User {number}",
+                                                'uid': f"user{number}"})
+
+    connection.strategy.add_entry(GROUP_DN, {'objectClass': ['group'], 'member': user_dns[:members]})
+
+    connection.bind()
+
+    return connection
+
+
+def user_search_configs(match_group):
+    configs = {'base_dn': BASE_DN,
+               'filter': '(&(objectClass=person)(objectClass=user))',
+               'full_name_attr': 'cn',
+               'match_group_iterate': False,
+               'scope_subtree': True,
+               'username_attr': 'uid'}
+
+    if match_group:
+        configs.update({'match_group': True,
+                        'match_group_dn': GROUP_DN,
+                        'match_group_member_attr': 'member'})
+
+    return configs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000, help="Number of users under the search base")
+    parser.add_argument("--members", type=int, default=20, help="Number of those users in the matched group")
+    parser.add_argument("--latency_ms", type=float, default=2.0, help="Simulated round trip per LDAP search")
+    parser.add_argument("--page_size", type=int, default=LdapProfiler.DEFAULT_PAGE_SIZE, help="Paged search size")
+    parser.add_argument("--range_size", type=int, default=0,
+                        help="Return group members in ranges of this size, as Active Directory does with 1500")
+    parser.add_argument("--samples", type=int, default=LdapProfiler.DEFAULT_SAMPLES, help="Timed runs of each search")
+    parser.add_argument("--no_match_group", action='store_true', help="Profile without restricting to a group")
+    args = parser.parse_args()
+
+    connection = stand_in(args.users, args.members, args.latency_ms / 1000, args.range_size)
+
+    ldap_profiler = LdapProfiler({'server_url': 'ldap://ldap.benchmark.local'},
+                                 user_search_configs(not args.no_match_group),
+                                 page_size=args.page_size,
+                                 samples=args.samples,
+                                 connection=connection)
+
+    print(json.dumps(ldap_profiler.profile(), indent=2))
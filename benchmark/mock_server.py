@@ -0,0 +1,536 @@
+import base64
+import collections
+import datetime
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+UCP_CONFIG_TOML = """[auth]
+  backend = "managed"
+  default_new_user_role = "restrictedcontrol"
+
+[auth.sessions]
+  lifetime_minutes = 60
+  renewal_threshold_minutes = 20
+
+[scheduling_configuration]
+  enable_admin_ucp_scheduling = false
+  default_node_orchestrator = "swarm"
+
+[cluster_config]
+  controller_port = 443
+  kube_apiserver_port = 6443
+  swarm_port = 2376
+  swarm_strategy = "spread"
+  dns = []
+  dns_opt = []
+  dns_search = []
+  profiling_enabled = false
+  kv_timeout = 5000
+  kv_snapshot_count = 20000
+  external_service_lb = ""
+  metrics_retention_time = "24h"
+  metrics_scrape_interval = "1m"
+  rethinkdb_cache_size = "1GB"
+"""
+
+
+STREAMED = object()
+
+
+def timestamp(seconds):
+    moment = datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+
+    return f"{moment:%Y-%m-%dT%H:%M:%S}.{int(seconds * 1e9) % 1000000000:09d}Z"
+
+INTERLOCK_CONFIG_TOML = """ListenAddr = ":8080"
+DockerURL = "unix:///var/run/docker.sock"
+PollInterval = "3s"
+
+[Extensions]
+  [Extensions.default]
+    Image = "docker/ucp-interlock-extension:3.0.1"
+    ProxyImage = "docker/ucp-interlock-proxy:3.0.1"
+    ProxyServiceName = "ucp-interlock-proxy"
+    ProxyReplicas = 2
+    PublishMode = "ingress"
+    PublishedPort = 80
+    TargetPort = 80
+    PublishedSSLPort = 8443
+    TargetSSLPort = 443
+"""
+
+
+class ThreadingHttpServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockState:
+
+    def __init__(self, configs=1000, services=500, nodes=3, rollout_step=0.05):
+        self.lock = threading.Lock()
+        self.configs = collections.OrderedDict()
+        self.services = collections.OrderedDict()
+        self.tasks = collections.OrderedDict()
+        self.events = []
+        self.rollouts = {}
+        self.tokens = {}
+        self.nodes = [f"node-{number}" for number in range(1, nodes + 1)]
+        self.rollout_step = rollout_step
+        self.interlock = {'InterlockEnabled': True, 'HTTPPort': 80, 'HTTPSPort': 8443, 'Arch': 'x86_64'}
+
+        data = base64.b64encode(UCP_CONFIG_TOML.encode('utf-8')).decode('utf-8')
+        for number in range(1, configs + 1):
+            self.add_config(f"com.docker.ucp.config-{number}", data)
+
+        latest_config = next(reversed(self.configs.values()))
+
+        ucp_agent = self.add_service('ucp-agent', [{'ConfigID': latest_config['ID'],
+                                                    'ConfigName': latest_config['Spec']['Name'],
+                                                    'File': {'Name': '/etc/ucp/ucp.toml', 'UID': '0', 'GID': '0',
+                                                             'Mode': 292}}])
+
+        for node in self.nodes:
+            self.add_task(ucp_agent, node, 'running', time.time())
+
+        interlock_data = base64.b64encode(INTERLOCK_CONFIG_TOML.encode('utf-8')).decode('utf-8')
+        interlock_config = self.add_config('com.docker.ucp.interlock.conf-1', interlock_data)
+
+        ucp_interlock = self.add_service('ucp-interlock', [{'ConfigID': interlock_config['ID'],
+                                                            'ConfigName': interlock_config['Spec']['Name'],
+                                                            'File': {'Name': '/config.toml', 'UID': '0', 'GID': '0',
+                                                                     'Mode': 292}}])
+        self.add_task(ucp_interlock, self.nodes[0], 'running', time.time())
+
+        for number in range(1, services):
+            self.add_service(f"app-{number:04d}", [])
+
+        return
+
+    def add_config(self, name, data):
+        config_id = uuid.uuid4().hex[:25]
+        self.configs[config_id] = {'ID': config_id,
+                                   'Version': {'Index': len(self.configs) + 1},
+                                   'CreatedAt': '2018-06-01T00:00:00.000000000Z',
+                                   'UpdatedAt': '2018-06-01T00:00:00.000000000Z',
+                                   'Spec': {'Name': name, 'Labels': {}, 'Data': data}}
+
+        return self.configs[config_id]
+
+    def add_service(self, name, configs):
+        service_id = uuid.uuid4().hex[:25]
+        self.services[service_id] = {
+            'ID': service_id,
+            'Version': {'Index': 1},
+            'CreatedAt': timestamp(time.time()),
+            'UpdatedAt': timestamp(time.time()),
+            'Spec': {'Name': name,
+                     'Labels': {},
+                     'TaskTemplate': {'ContainerSpec': {'Image': f"docker/{name}:latest",
+                                                        'Configs': configs},
+                                      'ForceUpdate': 0},
+                     'Mode': {'Global': {}}}}
+
+        return self.services[service_id]
+
+    def add_task(self, service, node, state, created):
+        task_id = uuid.uuid4().hex[:25]
+        self.tasks[task_id] = {'ID': task_id,
+                               'ServiceID': service['ID'],
+                               'NodeID': node,
+                               'CreatedAt': timestamp(created),
+                               'DesiredState': 'running',
+                               'Status': {'State': state, 'Message': state}}
+
+        return self.tasks[task_id]
+
+    def add_event(self, service, old_state, new_state, moment):
+        self.events.append({'Type': 'service',
+                            'Action': 'update',
+                            'Actor': {'ID': service['ID'],
+                                      'Attributes': {'name': service['Spec']['Name'],
+                                                     'updatestate.old': old_state,
+                                                     'updatestate.new': new_state}},
+                            'time': int(moment),
+                            'timeNano': int(moment * 1e9)})
+
+        return
+
+    def start_rollout(self, service):
+        now = time.time()
+
+        service['UpdatedAt'] = timestamp(now)
+        old_state = (service.get('UpdateStatus') or {}).get('State', '')
+        service['UpdateStatus'] = {'State': 'updating', 'StartedAt': timestamp(now), 'Message': 'update in progress'}
+        self.add_event(service, old_state, 'updating', now)
+
+        nodes = [task['NodeID'] for task in self.tasks.values()
+                 if task['ServiceID'] == service['ID'] and task['DesiredState'] == 'running']
+
+        # Nodes are updated one at a time, a new task starts at every step and is running half a step later
+        self.rollouts[service['ID']] = [(now + index * self.rollout_step, node) for index, node in enumerate(nodes)]
+
+        return
+
+    def advance(self):
+        now = time.time()
+
+        for service_id, steps in list(self.rollouts.items()):
+            service = self.services[service_id]
+
+            while steps and steps[0][0] <= now:
+                moment, node = steps.pop(0)
+
+                for task in self.tasks.values():
+                    if task['ServiceID'] == service_id and task['NodeID'] == node and \
+                            task['DesiredState'] == 'running':
+                        task['DesiredState'] = 'shutdown'
+                        task['Status'] = {'State': 'shutdown', 'Message': 'shutdown'}
+
+                self.add_task(service, node, 'starting', moment)
+
+            for task in self.tasks.values():
+                if task['ServiceID'] == service_id and task['Status']['State'] == 'starting':
+                    if self.__seconds(task['CreatedAt']) + self.rollout_step / 2 <= now:
+                        task['Status'] = {'State': 'running', 'Message': 'started'}
+
+            if not steps and all(task['Status']['State'] != 'starting' for task in self.tasks.values()
+                                 if task['ServiceID'] == service_id):
+                service['UpdateStatus'] = dict(service['UpdateStatus'], State='completed',
+                                               CompletedAt=timestamp(now), Message='update completed')
+                self.add_event(service, 'updating', 'completed', now)
+
+                del self.rollouts[service_id]
+
+        return
+
+    def __seconds(self, value):
+        date, fraction = value.rstrip('Z').split('.')
+        moment = datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+
+        return moment.timestamp() + int(fraction) / 1e9
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        ('POST', r'^/id/login$', 'login'),
+        ('POST', r'^/id/logout$', 'logout'),
+        ('GET', r'^/id$', 'whoami'),
+        ('GET', r'^/configs$', 'list_configs'),
+        ('POST', r'^/configs/create$', 'create_config'),
+        ('GET', r'^/configs/(?P<id>[^/]+)$', 'get_config'),
+        ('DELETE', r'^/configs/(?P<id>[^/]+)$', 'delete_config'),
+        ('GET', r'^/services$', 'list_services'),
+        ('GET', r'^/services/(?P<id>[^/]+)$', 'get_service'),
+        ('GET', r'^/tasks$', 'list_tasks'),
+        ('GET', r'^/events$', 'stream_events'),
+        ('POST', r'^/services/(?P<id>[^/]+)/update$', 'update_service'),
+        ('GET', r'^/api/interlock$', 'get_interlock'),
+        ('POST', r'^/api/interlock$', 'create_interlock'),
+        ('PUT', r'^/api/interlock$', 'update_interlock'),
+        ('DELETE', r'^/api/interlock$', 'delete_interlock'),
+        ('POST', r'^/api/nodes/certs$', 'update_ucp_certs'),
+        ('POST', r'^/api/v0/api_tokens$', 'create_token'),
+        ('GET', r'^/api/v0/api_tokens/(?P<id>[^/]+)$', 'get_token'),
+        ('DELETE', r'^/api/v0/api_tokens/(?P<id>[^/]+)$', 'delete_token'),
+        ('POST', r'^/api/v0/meta/settings$', 'update_dtr_settings'),
+    ]
+
+    def do_DELETE(self):
+        self.__dispatch('DELETE')
+
+    def do_GET(self):
+        self.__dispatch('GET')
+
+    def do_POST(self):
+        self.__dispatch('POST')
+
+    def do_PUT(self):
+        self.__dispatch('PUT')
+
+    def log_message(self, format, *args):
+        return
+
+    def __dispatch(self, method):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        self.query = parse_qs(url.query)
+        self.body = json.loads(body.decode('utf-8')) if body else None
+
+        for route_method, pattern, name in self.routes:
+            match = re.match(pattern, url.path)
+
+            if route_method == method and match:
+                template = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', pattern).strip('^$')
+                break
+        else:
+            match, name, template = None, None, url.path
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with self.server.state.lock:
+            self.server.state.advance()
+
+        if name is None:
+            status, payload = 404, {'message': f"No route for {method} {url.path}"}
+        else:
+            status, payload = getattr(self, name)(**match.groupdict())
+
+        if payload is STREAMED:
+            return
+
+        response = json.dumps(payload).encode('utf-8') if payload is not None else b''
+
+        self.send_response(status)
+        if response:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+        self.server.account(method, template, status, len(body), len(response))
+
+        return
+
+    def __filters(self):
+        if 'filters' not in self.query:
+            return {}
+
+        return json.loads(self.query['filters'][0])
+
+    def __named(self, entries):
+        names = self.__filters().get('name')
+
+        if not names:
+            return list(entries)
+
+        return [entry for entry in entries if any(entry['Spec']['Name'].startswith(name) for name in names)]
+
+    def login(self):
+        token = uuid.uuid4().hex
+
+        with self.server.state.lock:
+            self.server.state.tokens[token] = self.body['username']
+
+        return 200, {'sessionToken': token}
+
+    def logout(self):
+        return 204, None
+
+    def whoami(self):
+        return 200, {'name': 'admin'}
+
+    def list_configs(self):
+        with self.server.state.lock:
+            return 200, self.__named(self.server.state.configs.values())
+
+    def create_config(self):
+        with self.server.state.lock:
+            config = self.server.state.add_config(self.body['Name'], self.body['Data'])
+
+        return 200, {'ID': config['ID']}
+
+    def get_config(self, id):
+        with self.server.state.lock:
+            if id not in self.server.state.configs:
+                return 404, {'message': f"config {id} not found"}
+
+            return 200, self.server.state.configs[id]
+
+    def delete_config(self, id):
+        with self.server.state.lock:
+            if id not in self.server.state.configs:
+                return 404, {'message': f"config {id} not found"}
+
+            for service in self.server.state.services.values():
+                configs = service['Spec']['TaskTemplate']['ContainerSpec']['Configs']
+
+                if any(entry['ConfigID'] == id for entry in configs):
+                    return 400, {'message': f"config '{id}' is in use by service '{service['ID']}'"}
+
+            del self.server.state.configs[id]
+
+        return 204, None
+
+    def list_services(self):
+        with self.server.state.lock:
+            return 200, self.__named(self.server.state.services.values())
+
+    def get_service(self, id):
+        with self.server.state.lock:
+            if id not in self.server.state.services:
+                return 404, {'message': f"service {id} not found"}
+
+            return 200, self.server.state.services[id]
+
+    def list_tasks(self):
+        services = self.__filters().get('service')
+
+        with self.server.state.lock:
+            return 200, [task for task in self.server.state.tasks.values()
+                         if not services or task['ServiceID'] in services]
+
+    def stream_events(self):
+        services = self.__filters().get('service')
+        since = float(self.query.get('since', [time.time()])[0])
+        until = float(self.query.get('until', [time.time() + 60])[0])
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        sent = 0
+        position = 0
+        while time.time() < until:
+            with self.server.state.lock:
+                self.server.state.advance()
+                events = self.server.state.events[position:]
+                position = len(self.server.state.events)
+
+            for event in events:
+                if since * 1e9 < event['timeNano'] <= until * 1e9 and \
+                        (not services or event['Actor']['ID'] in services):
+                    line = json.dumps(event).encode('utf-8') + b'\n'
+                    self.wfile.write(f"{len(line):x}\r\n".encode('utf-8') + line + b'\r\n')
+                    self.wfile.flush()
+                    sent += len(line)
+
+            time.sleep(min(0.01, max(until - time.time(), 0)))
+
+        self.wfile.write(b'0\r\n\r\n')
+        self.server.account('GET', '/events', 200, 0, sent)
+
+        return 200, STREAMED
+
+    def update_service(self, id):
+        with self.server.state.lock:
+            service = self.server.state.services.get(id)
+
+            if service is None:
+                return 404, {'message': f"service {id} not found"}
+
+            if int(self.query.get('version', ['0'])[0]) != service['Version']['Index']:
+                return 500, {'message': 'update out of sequence'}
+
+            service['Spec'] = self.body
+            service['Version']['Index'] += 1
+
+            if any(task['ServiceID'] == id for task in self.server.state.tasks.values()):
+                self.server.state.start_rollout(service)
+
+        return 200, {'Warnings': None}
+
+    def get_interlock(self):
+        return 200, self.server.state.interlock
+
+    def create_interlock(self):
+        if self.server.state.interlock['InterlockEnabled']:
+            return 400, {'message': 'Interlock is already enabled'}
+
+        self.server.state.interlock = dict(self.body, InterlockEnabled=True)
+
+        return 204, None
+
+    def update_interlock(self):
+        # UCP keeps reporting the ports it was given here, whatever ucp-interlock is configured with
+        self.server.state.interlock = dict(self.body)
+
+        return 204, None
+
+    def delete_interlock(self):
+        self.server.state.interlock = {'InterlockEnabled': False}
+
+        return 204, None
+
+    def update_ucp_certs(self):
+        return 200, {}
+
+    def create_token(self):
+        token = uuid.uuid4().hex
+        hashed_token = uuid.uuid4().hex
+
+        with self.server.state.lock:
+            self.server.state.tokens[hashed_token] = token
+
+        return 200, {'token': token, 'hashedToken': hashed_token, 'tokenLabel': self.body['tokenLabel']}
+
+    def get_token(self, id):
+        return (200, {'hashedToken': id}) if id in self.server.state.tokens else (404, None)
+
+    def delete_token(self, id):
+        with self.server.state.lock:
+            self.server.state.tokens.pop(id, None)
+
+        return 200, None
+
+    def update_dtr_settings(self):
+        return 202, {}
+
+
+class MockServer:
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, configs=1000, services=500, rollout_step=0.05):
+        self.server = ThreadingHttpServer((host, port), MockHandler)
+        self.server.latency = latency
+        self.server.state = MockState(configs=configs, services=services, rollout_step=rollout_step)
+        self.server.account = self.__account
+
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.reset_accounting()
+
+        return
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+
+        return f"{host}:{port}"
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.__thread.start()
+
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+        return
+
+    def reset_accounting(self):
+        with self.__lock:
+            self.requests = collections.Counter()
+            self.bytes_received = 0
+            self.bytes_sent = 0
+
+        return
+
+    def accounting(self):
+        with self.__lock:
+            return {'requests': sum(self.requests.values()),
+                    'bytes_received': self.bytes_received,
+                    'bytes_sent': self.bytes_sent,
+                    'endpoints': {f"{method} {template} {status}": count
+                                  for (method, template, status), count in sorted(self.requests.items())}}
+
+    def __account(self, method, template, status, bytes_received, bytes_sent):
+        with self.__lock:
+            self.requests[(method, template, status)] += 1
+            self.bytes_received += bytes_received
+            self.bytes_sent += bytes_sent
+
+        return
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_server import MockServer
+
+path = os.path.dirname(os.path.realpath(__file__))
+dry_dock_path = os.path.realpath(f"{path}/../dry-dock")
+
+sys.path.insert(0, f"{dry_dock_path}/lib")
+
+from task import Task  # noqa: E402
+
+CONFIG_TEMPLATES = {
+    'auth.yml': """auth:
+  backend: 'ldap'
+  ldap:
+    server_url: 'ldap://ldap.benchmark.local'
+    reader_dn: 'CN=reader,OU=Users,DC=benchmark,DC=local'
+    reader_password: 'reader-password'
+    tls_skip_verify: True
+    start_tls: False
+    no_simple_pagination: False
+    jit_user_provisioning: False
+  user_search_configs:
+    base_dn: 'OU=Users,DC=benchmark,DC=local'
+    filter: '(&(objectClass=person)(objectClass=user))'
+    full_name_attr: 'cn'
+    match_group_iterate: False
+    search_filter: ''
+    scope_subtree: True
+    username_attr: 'uid'
+""",
+    'certbot.yml': """email: benchmark@benchmark.local
+always_apply_certs:
+  dtr: True
+  ucp: True
+probe_served_certs: False
+aws:
+  access_key_id: 'benchmark'
+  secret_access_key: 'benchmark'
+""",
+    'dtr.yml': """endpoint: '{address}'
+use_ssl: False
+credentials:
+  username: 'admin'
+  password: 'password'
+ssl_certificate:
+  domain_name: 'dtr.benchmark.local'
+""",
+    'interlock.yml': """http_port: 80
+https_port: 443
+architecture: "x86_64"
+""",
+    'logging.yml': """log_level: '{log_level}'
+""",
+    'ucp.yml': """endpoint: '{address}'
+use_ssl: False
+verify_ssl: False
+username: 'admin'
+password: 'password'
+wait_for_rollout:
+  timeout: 60
+config_retention:
+  keep: 10
+ssl_certificate:
+  domain_name: 'ucp.benchmark.local'
+"""
+}
+
+
+def write_conf_dir(conf_path, address, log_level):
+    os.makedirs(conf_path, exist_ok=True)
+
+    for file_name, template in CONFIG_TEMPLATES.items():
+        with open(f"{conf_path}/{file_name}", 'w') as file:
+            file.write(template.format(address=address, log_level=log_level))
+
+    return
+
+
+def run_script(script, conf_dir):
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = f"{dry_dock_path}/lib"
+
+    with tempfile.TemporaryFile() as output:
+        start = time.monotonic()
+
+        process = subprocess.Popen([sys.executable, script, '--conf_dir', conf_dir],
+                                   stdout=output,
+                                   stderr=subprocess.STDOUT,
+                                   env=environment)
+
+        # wait4 reports the resource usage of this child alone
+        pid, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+
+        duration = time.monotonic() - start
+
+        output.seek(0)
+        tail = output.read().decode('utf-8', errors='replace').splitlines()[-20:]
+
+    return {'returncode': process.returncode,
+            'wall_time': duration,
+            'peak_rss_kb': rusage.ru_maxrss,
+            'output_tail': tail}
+
+
+def measure_import_time(task_name, conf_dir):
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = f"{dry_dock_path}/lib"
+
+    # Loading the task imports exactly what the dry-dock CLI imports before the task starts running
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              f"from task import Task; Task({task_name!r}, {conf_dir!r}).load()"],
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE,
+                             env=environment)
+
+    modules = []
+    for line in process.stderr.decode('utf-8', errors='replace').splitlines():
+        match = re.match(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$', line)
+
+        if match:
+            modules.append({'module': match.group(4),
+                            'self_us': int(match.group(1)),
+                            'cumulative_us': int(match.group(2)),
+                            'top_level': len(match.group(3)) == 1})
+
+    # -X importtime needs Python 3.7 or later
+    if not modules:
+        return None
+
+    return {'import_time_ms': sum(module['self_us'] for module in modules) / 1000,
+            'slowest_imports': [{'module': module['module'], 'cumulative_ms': module['cumulative_us'] / 1000}
+                                for module in sorted((module for module in modules if module['top_level']),
+                                                     key=lambda module: module['cumulative_us'],
+                                                     reverse=True)[:5]]}
+
+
+def run_benchmark(task_name, args):
+    conf_dir = f".benchmark-{os.getpid()}-{task_name}"
+    conf_path = f"{dry_dock_path}/conf/{conf_dir}"
+    script = Task(task_name, conf_dir).script
+
+    runs = []
+    import_time = None
+
+    try:
+        for iteration in range(args.repeat):
+            server = MockServer(latency=args.latency, configs=args.configs, services=args.services).start()
+
+            try:
+                write_conf_dir(conf_path, server.address, args.log_level)
+
+                result = run_script(script, conf_dir)
+                result.update(server.accounting())
+
+                if import_time is None:
+                    import_time = measure_import_time(task_name, conf_dir)
+
+            finally:
+                server.stop()
+
+            runs.append(result)
+
+    finally:
+        shutil.rmtree(conf_path, ignore_errors=True)
+
+    return {'task': task_name,
+            'runs': runs,
+            'wall_time': min(run['wall_time'] for run in runs),
+            'requests': max(run['requests'] for run in runs),
+            'bytes': max(run['bytes_received'] + run['bytes_sent'] for run in runs),
+            'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+            'import_time': import_time,
+            'over_import_budget': import_time is not None and import_time['import_time_ms'] > args.import_budget_ms,
+            'failed': any(run['returncode'] != 0 for run in runs)}
+
+
+def print_report(results, import_budget_ms):
+    print(f"{'task':<12} {'wall time (s)':>14} {'requests':>9} {'bytes':>12} {'peak RSS (KiB)':>15} "
+          f"{'imports (ms)':>13} {'status':>7}")
+
+    for result in results:
+        status = 'FAILED' if result['failed'] else 'SLOW' if result['over_import_budget'] else 'ok'
+        import_time = f"{result['import_time']['import_time_ms']:.1f}" if result['import_time'] else 'n/a'
+
+        print(f"{result['task']:<12} {result['wall_time']:>14.3f} {result['requests']:>9} {result['bytes']:>12} "
+              f"{result['peak_rss_kb']:>15} {import_time:>13} {status:>7}")
+
+    for result in results:
+        if result['over_import_budget']:
+            print(f"\n{result['task']} imports took {result['import_time']['import_time_ms']:.1f}ms, "
+                  f"over the {import_budget_ms:.1f}ms budget. Slowest top level imports:")
+
+            for module in result['import_time']['slowest_imports']:
+                print(f"  {module['module']:<40} {module['cumulative_ms']:>8.1f}ms")
+
+    for result in results:
+        if result['failed']:
+            failed_run = next(run for run in result['runs'] if run['returncode'] != 0)
+            print(f"\n{result['task']} failed with exit code {failed_run['returncode']}:")
+            print('\n'.join(failed_run['output_tail']))
+
+    return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", nargs='+', choices=Task.names(), default=['auth', 'config-gc', 'l7-routing'],
+                        help="Tasks to benchmark, certs needs certbot and issued certificates")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency injected into every response")
+    parser.add_argument("--configs", type=int, default=1000, help="Number of com.docker.ucp.config objects")
+    parser.add_argument("--services", type=int, default=500, help="Number of services")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per task, the fastest wall time is reported")
+    parser.add_argument("--log_level", default='WARNING', help="Log level of the benchmarked scripts")
+    parser.add_argument("--import_budget_ms", type=float, default=150.0,
+                        help="Import time allowed before a task starts running, measured with -X importtime")
+    parser.add_argument("--json", help="Write the full results to this file")
+    args = parser.parse_args()
+
+    results = [run_benchmark(task_name, args) for task_name in args.tasks]
+
+    print_report(results, args.import_budget_ms)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'parameters': vars(args), 'results': results}, file, indent=2)
+
+    if any(result['failed'] or result['over_import_budget'] for result in results):
+        sys.exit(1)
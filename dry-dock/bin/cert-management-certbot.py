@@ -1,35 +1,61 @@
 import argparse
+import contextlib
 import glob
 import os
+import shutil
+import ssl
+from concurrent.futures import ThreadPoolExecutor
 
+from cert_lineage_index import CertLineageIndex
 from config_loader import ConfigLoader
 from dtr_api import DtrApi
 from execute_command import ExecuteCommand
+from file_lock import FileLock
 from logger import Logger
+from metrics import Metrics, timed
+from tls_probe import TlsProbe
+from token_cache import TokenCache
 from ucp_api import UcpApi
 
+DEFAULT_AUTHENTICATOR = 'dns-route53'
+DEFAULT_RENEW_BEFORE_EXPIRY_DAYS = 30
+EXECUTION_MAX_LINES = 1000
+PROBE_MAX_WORKERS = 8
+
 config = None
 dtr_api = None
+lineage_indexes = {}
 logger = None
+metrics = Metrics()
 path = os.path.dirname(os.path.realpath(__file__))
 ucp_api = None
 
 
-def apply_dtr_certs():
+@timed('apply_dtr_certs')
+def apply_dtr_certs(cert_directory=None):
     global dtr_api
 
-    dtr_api = DtrApi(endpoint=config['dtr']['endpoint'],
-                     username=config['dtr']['credentials']['username'],
-                     password=config['dtr']['credentials']['password'],
-                     use_ssl=config['dtr']['use_ssl'],
-                     verify_ssl=False,
-                     logger=logger)
+    if cert_directory is None:
+        cert_directory = find_cert_directory('dtr')
 
-    dtr_api.create_token('cert-management')
+    if cert_directory is None:
+        raise Exception(f"No certificate found for {config['dtr']['ssl_certificate']['domain_name']}")
+
+    if certificate_is_served('dtr', cert_directory):
+        logger.info("DTR is already serving the current certificate")
+        return None
 
-    cert_directory = sorted(
-        glob.glob(f"{path}/../certs/certbot/config/live/{config['dtr']['ssl_certificate']['domain_name']}**"),
-        reverse=True)[0]
+    if dtr_api is None:
+        dtr_api = DtrApi(endpoint=config['dtr']['endpoint'],
+                         username=config['dtr']['credentials']['username'],
+                         password=config['dtr']['credentials']['password'],
+                         use_ssl=config['dtr']['use_ssl'],
+                         verify_ssl=False,
+                         logger=logger,
+                         metrics=metrics,
+                         token_cache=TokenCache.from_config(config['dtr']))
+
+    dtr_api.create_token('cert-management')
 
     body = {"dtrHost": config['dtr']['ssl_certificate']['domain_name'],
             "webTLSCA": open(f"{cert_directory}/chain.pem").read(),
@@ -43,21 +69,31 @@ def apply_dtr_certs():
     return response
 
 
-def apply_ucp_certs():
+@timed('apply_ucp_certs')
+def apply_ucp_certs(cert_directory=None):
     global ucp_api
 
-    ucp_api = UcpApi(config['ucp']['endpoint'],
-                     config['ucp']['username'],
-                     config['ucp']['password'],
-                     config['ucp']['use_ssl'],
-                     verify_ssl=False,
-                     logger=logger)
+    if cert_directory is None:
+        cert_directory = find_cert_directory('ucp')
 
-    ucp_api.login()
+    if cert_directory is None:
+        raise Exception(f"No certificate found for {config['ucp']['ssl_certificate']['domain_name']}")
+
+    if certificate_is_served('ucp', cert_directory):
+        logger.info("UCP is already serving the current certificate")
+        return None
 
-    cert_directory = sorted(
-        glob.glob(f"{path}/../certs/certbot/config/live/{config['ucp']['ssl_certificate']['domain_name']}**"),
-        reverse=True)[0]
+    if ucp_api is None:
+        ucp_api = UcpApi(config['ucp']['endpoint'],
+                         config['ucp']['username'],
+                         config['ucp']['password'],
+                         config['ucp']['use_ssl'],
+                         verify_ssl=False,
+                         logger=logger,
+                         metrics=metrics,
+                         token_cache=TokenCache.from_config(config['ucp']))
+
+    ucp_api.login()
 
     body = {"ca": open(f"{cert_directory}/chain.pem").read(),
             "key": open(f"{cert_directory}/privkey.pem").read(),
@@ -70,139 +106,439 @@ def apply_ucp_certs():
     return response
 
 
-def generate_dtr_certs():
-    environment = {
-        'AWS_ACCESS_KEY_ID': config['certbot']['aws']['access_key_id'],
-        'AWS_SECRET_ACCESS_KEY': config['certbot']['aws']['secret_access_key']
-    }
+def certbot_command(component, domains, cert_name=None, force_renewal=False):
+    authenticator = config['certbot'].get('authenticator', DEFAULT_AUTHENTICATOR)
+
+    link_shared_accounts(certbot_directory(component, 'config'))
 
     command = ["certbot", "certonly",
-               "--authenticator", "dns-route53",
+               "--authenticator", authenticator,
                "--email", config['certbot']['email'],
                "--agree-tos",
                "--no-eff-email",
                "--keep-until-expiring",
-               "--dns-route53",
-               "--config-dir", f'{path}/../certs/certbot/config',
-               "--logs-dir", f"{path}/../certs/certbot/log",
-               "--work-dir", f"{path}/../certs/certbot/work",
-               "-d", config['dtr']['ssl_certificate']['domain_name']]
+               "--config-dir", certbot_directory(component, 'config'),
+               "--logs-dir", certbot_directory(component, 'log'),
+               "--work-dir", certbot_directory(component, 'work')]
 
-    if 'sans' in config['dtr']['ssl_certificate'] and config['dtr']['ssl_certificate']['sans']:
-        for san in config['dtr']['ssl_certificate']['sans']:
-            command.append("-d")
-            command.append(san)
+    if authenticator == 'dns-route53':
+        command.append("--dns-route53")
 
-    logger.debug(f"Preparing to execute command: {' '.join(command)}")
+    # Certbot only renews within its own 30 days of expiry, which would make a longer renew_before_expiry_days retry
+    # forever without renewing. Whether an existing certificate is due has already been decided against that setting.
+    if force_renewal:
+        command.append("--force-renewal")
 
-    execution = ExecuteCommand(command, environment)
+    # A local ACME server such as Pebble can stand in for Let's Encrypt when testing renewals
+    if config['certbot'].get('server'):
+        command.extend(["--server", config['certbot']['server']])
 
-    logger.debug(f"Execution results: {logger.prepare_execution(execution)}")
+    if cert_name is not None:
+        command.extend(["--cert-name", cert_name])
 
-    if execution.result.returncode != 0:
-        logger.error(f"Execution failed: {logger.prepare_execution(execution)}")
-        raise Exception("Execution failed!")
+    for domain in domains:
+        command.append("-d")
+        command.append(domain)
 
-    if 'Certificate not yet due for renewal; no action taken.' in execution.result.stdout:
-        logger.info("DTR certificates are not yet due for renewal")
+    return command
+
+
+def certbot_directory(component, name):
+    # Certbot locks its config, work and logs directories, so every cluster and component needs its own set to run
+    # concurrently. Certificates shared by several clusters are not kept under any one of them. The ACME accounts
+    # are shared by all of them, see link_shared_accounts().
+    if component in ['dtr', 'ucp']:
+        return f"{path}/../certs/certbot/clusters/{config.config_loader.conf_dir}/{component}/{name}"
+
+    return f"{path}/../certs/certbot/{component}/{name}"
+
+
+def certificate_domains(component):
+    ssl_certificate = config[component]['ssl_certificate']
+
+    domains = [ssl_certificate['domain_name']]
+    if 'sans' in ssl_certificate and ssl_certificate['sans']:
+        domains.extend(ssl_certificate['sans'])
+
+    return domains
+
+
+def certificate_is_served(component, cert_directory):
+    if not config['certbot'].get('probe_served_certs', True):
+        return False
+
+    fingerprint = TlsProbe.file_fingerprint(f"{cert_directory}/fullchain.pem")
+
+    addresses = [config[component]['endpoint']]
+    for domain in certificate_domains(component):
+        if not domain.startswith('*.') and domain not in addresses:
+            addresses.append(domain)
+
+    with ThreadPoolExecutor(max_workers=min(len(addresses), PROBE_MAX_WORKERS)) as executor:
+        served_fingerprints = dict(zip(addresses, executor.map(served_fingerprint, addresses)))
+
+    stale = [address for address, served in served_fingerprints.items() if served != fingerprint]
+
+    if stale:
+        logger.info(f"{component.upper()} certificate is not served by {', '.join(stale)}")
         return False
 
     return True
 
 
-def generate_ucp_certs():
-    environment = {
-        'AWS_ACCESS_KEY_ID': config['certbot']['aws']['access_key_id'],
-        'AWS_SECRET_ACCESS_KEY': config['certbot']['aws']['secret_access_key']
-    }
+def certificate_is_current(label, cert_directory, domains):
+    if cert_directory is None:
+        return False
 
-    command = ["certbot", "certonly",
-               "--authenticator", "dns-route53",
-               "--email", config['certbot']['email'],
-               "--agree-tos",
-               "--no-eff-email",
-               "--keep-until-expiring",
-               "--dns-route53",
-               "--config-dir", f'{path}/../certs/certbot/config',
-               "--logs-dir", f"{path}/../certs/certbot/log",
-               "--work-dir", f"{path}/../certs/certbot/work",
-               "-d", config['ucp']['ssl_certificate']['domain_name']]
+    # cryptography is slow to import and not needed when there is no certificate yet
+    from certificate import Certificate
+
+    try:
+        certificate = Certificate(f"{cert_directory}/fullchain.pem")
+
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unable to read the existing {label} certificate: {e}")
+        return False
+
+    renew_before_expiry_days = config['certbot'].get('renew_before_expiry_days', DEFAULT_RENEW_BEFORE_EXPIRY_DAYS)
+
+    if certificate.expires_within(renew_before_expiry_days):
+        logger.info(f"{label} certificate expires {certificate.not_after}, renewing")
+        return False
+
+    if not certificate.matches(domains):
+        logger.info(f"{label} certificate domains {sorted(certificate.domains)} do not match configuration")
+        return False
+
+    return True
+
+
+def link_shared_accounts(config_directory):
+    # Every config directory registering its own ACME account would count against the per IP registration limit of
+    # Let's Encrypt, so accounts/ in each of them links to one shared directory
+    shared = shared_accounts_directory()
+    accounts = f"{config_directory}/accounts"
+
+    os.makedirs(shared, mode=0o700, exist_ok=True)
+    os.makedirs(config_directory, exist_ok=True)
+
+    if os.path.islink(accounts):
+        return False
+
+    previous = None
+    if os.path.isdir(accounts):
+        previous = f"{accounts}.{os.getpid()}.old"
+        os.rename(accounts, previous)
+
+    temp_link = f"{accounts}.{os.getpid()}.tmp"
+    os.symlink(os.path.relpath(shared, config_directory), temp_link)
+    os.replace(temp_link, accounts)
+
+    if previous is not None:
+        merge_accounts(previous, shared)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    return True
 
-    if 'sans' in config['ucp']['ssl_certificate'] and config['ucp']['ssl_certificate']['sans']:
-        for san in config['ucp']['ssl_certificate']['sans']:
-            command.append("-d")
-            command.append(san)
 
-    logger.debug(f"Executing command: {' '.join(command)}")
+def merge_accounts(source, shared):
+    # Certbot asks which account to use when a server has several, so an account is only kept while its server has
+    # none in the shared directory yet
+    for directory, subdirectories, files in os.walk(source):
+        if 'regr.json' not in files:
+            continue
 
-    execution = ExecuteCommand(command, environment)
+        server = os.path.relpath(os.path.dirname(directory), source)
 
-    logger.debug(f"Execution results: {logger.prepare_execution(execution)}")
+        if os.path.isdir(f"{shared}/{server}") and os.listdir(f"{shared}/{server}"):
+            continue
+
+        shutil.copytree(directory, f"{shared}/{server}/{os.path.basename(directory)}")
+
+        logger.info("Kept the ACME account %s for %s", os.path.basename(directory), server)
+
+    return
+
+
+def migrate_certbot_directory(component):
+    # Earlier releases kept every certificate in certs/certbot/config, and then one directory per component. Copying
+    # them keeps the issued certificates and the ACME account instead of ordering everything again.
+    target = certbot_directory(component, 'config')
+
+    if os.path.exists(target):
+        return False
+
+    sources = [f"{path}/../certs/certbot/{component}/config", f"{path}/../certs/certbot/config"]
+    source = next((source for source in sources if os.path.isdir(f"{source}/renewal")), None)
+
+    if source is None:
+        return False
+
+    temp_target = f"{target}.{os.getpid()}.tmp"
+
+    # The live/ symlinks are relative, only the renewal files record the absolute directory
+    shutil.copytree(source, temp_target, symlinks=True)
+
+    for renewal_file in glob.glob(f"{temp_target}/renewal/*.conf"):
+        with open(renewal_file) as file:
+            renewal = file.read()
+
+        for previous in [source, os.path.realpath(source)]:
+            renewal = renewal.replace(f"{previous}/", f"{target}/")
+
+        with open(renewal_file, 'w') as file:
+            file.write(renewal)
+
+    try:
+        os.rename(temp_target, target)
+
+    except OSError:
+        shutil.rmtree(temp_target, ignore_errors=True)
+        return False
+
+    logger.info(f"Copied the {component.upper()} certbot configuration from {os.path.realpath(source)}")
+
+    return True
+
+
+def run_certbot(label, command):
+    environment = {}
+
+    if 'aws' in config['certbot']:
+        environment['AWS_ACCESS_KEY_ID'] = config['certbot']['aws']['access_key_id']
+        environment['AWS_SECRET_ACCESS_KEY'] = config['certbot']['aws']['secret_access_key']
+
+    if config['certbot'].get('ca_bundle'):
+        environment['REQUESTS_CA_BUNDLE'] = config['certbot']['ca_bundle']
+
+    logger.debug("Executing command: %s", ' '.join(command))
+
+    with contextlib.ExitStack() as stack:
+        # Until the shared ACME account is registered, runs wait for each other so that only one registers it
+        if not shared_account_exists():
+            stack.enter_context(FileLock(f"{shared_accounts_directory()}.lock"))
+
+        execution = ExecuteCommand(command, environment,
+                                   logger=logger,
+                                   timeout=config['certbot'].get('timeout'),
+                                   max_lines=EXECUTION_MAX_LINES)
+
+    logger.debug("Execution results: %s", logger.prepare_execution(execution))
 
     if execution.result.returncode != 0:
-        logger.error(f"Execution failed: {logger.prepare_execution(execution)}")
+        logger.error("Execution failed: %s", logger.prepare_execution(execution))
         raise Exception("Execution failed!")
 
     if 'Certificate not yet due for renewal; no action taken.' in execution.result.stdout:
-        logger.info("UCP certificates are not yet due for renewal")
+        logger.info(f"{label} certificates are not yet due for renewal")
         return False
 
     return True
 
 
+def seed_shared_lineage(component, cert_name, domains, seed_directories):
+    config_directory = certbot_directory(component, 'config')
+
+    for seed_directory in seed_directories:
+        if seed_directory is None or not certificate_is_current(cert_name, seed_directory, domains):
+            continue
+
+        seed_config_directory = os.path.dirname(os.path.dirname(seed_directory))
+        seed_name = os.path.basename(seed_directory)
+
+        if not os.path.isfile(f"{seed_config_directory}/renewal/{seed_name}.conf") or \
+                not os.path.isdir(f"{seed_config_directory}/archive/{seed_name}"):
+            continue
+
+        archive = f"{config_directory}/archive/{cert_name}"
+        live = f"{config_directory}/live/{cert_name}"
+
+        # Left over from an interrupted copy, the lineage only exists once its renewal file is written
+        shutil.rmtree(archive, ignore_errors=True)
+        shutil.rmtree(live, ignore_errors=True)
+
+        shutil.copytree(f"{seed_config_directory}/archive/{seed_name}", archive)
+
+        os.makedirs(live)
+        for entry in os.listdir(seed_directory):
+            if os.path.islink(f"{seed_directory}/{entry}"):
+                version = os.path.basename(os.readlink(f"{seed_directory}/{entry}"))
+                os.symlink(f"../../archive/{cert_name}/{version}", f"{live}/{entry}")
+
+        with open(f"{seed_config_directory}/renewal/{seed_name}.conf") as file:
+            renewal = file.read()
+
+        for previous in [seed_config_directory, os.path.realpath(seed_config_directory)]:
+            renewal = renewal.replace(f"{previous}/archive/{seed_name}", archive)
+            renewal = renewal.replace(f"{previous}/live/{seed_name}/", f"{live}/")
+
+        os.makedirs(f"{config_directory}/renewal", exist_ok=True)
+
+        temp_path = f"{config_directory}/renewal/{cert_name}.conf.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(renewal)
+
+        os.replace(temp_path, f"{config_directory}/renewal/{cert_name}.conf")
+
+        logger.info("Seeded %s from the current certificate in %s", cert_name, seed_directory)
+
+        return True
+
+    return False
+
+
+def served_fingerprint(address):
+    try:
+        return TlsProbe().served_fingerprint_for(address)
+
+    except (OSError, ssl.SSLError) as e:
+        logger.warning(f"Unable to probe the certificate served by {address}: {e}")
+        return None
+
+
+def find_cert_directory(component, domain_name=None):
+    if component not in lineage_indexes:
+        if component in ['dtr', 'ucp']:
+            migrate_certbot_directory(component)
+
+        lineage_indexes[component] = CertLineageIndex(certbot_directory(component, 'config'))
+
+    if domain_name is None:
+        domain_name = config[component]['ssl_certificate']['domain_name']
+
+    return lineage_indexes[component].cert_directory(domain_name)
+
+
+@timed('generate_dtr_certs')
+def generate_dtr_certs():
+    cert_directory = find_cert_directory('dtr')
+
+    if certificate_is_current('DTR', cert_directory, certificate_domains('dtr')):
+        logger.info("DTR certificates are not yet due for renewal")
+        return False
+
+    return run_certbot('DTR', certbot_command('dtr', certificate_domains('dtr'),
+                                              force_renewal=cert_directory is not None))
+
+
+@timed('generate_ucp_certs')
+def generate_ucp_certs():
+    cert_directory = find_cert_directory('ucp')
+
+    if certificate_is_current('UCP', cert_directory, certificate_domains('ucp')):
+        logger.info("UCP certificates are not yet due for renewal")
+        return False
+
+    return run_certbot('UCP', certbot_command('ucp', certificate_domains('ucp'),
+                                              force_renewal=cert_directory is not None))
+
+
+@timed('generate_shared_certs')
+def generate_shared_certs(cert_name, domains, seed_directories=None):
+    # Certificates shared between clusters live in their own certbot directories, so they can be issued concurrently
+    component = shared_component(cert_name)
+
+    if find_cert_directory(component, cert_name) is None:
+        seed_shared_lineage(component, cert_name, domains, seed_directories or [])
+
+    cert_directory = find_cert_directory(component, cert_name)
+
+    if certificate_is_current(cert_name, cert_directory, domains):
+        logger.info(f"{cert_name} certificates are not yet due for renewal")
+        return False
+
+    return run_certbot(cert_name, certbot_command(component, domains, cert_name=cert_name,
+                                                  force_renewal=cert_directory is not None))
+
+
+@timed('manage_certs')
 def manage_certs():
     global config
     global logger
 
     logger.info("Starting certificate management")
 
-    manage_ucp_certs()
-    manage_dtr_certs()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        ucp_future = executor.submit(manage_ucp_certs)
+        dtr_future = executor.submit(manage_dtr_certs)
+
+        cert_applied = {'ucp': ucp_future.result(),
+                        'dtr': dtr_future.result()}
 
     logger.info("Certificate management complete")
 
-    return
+    return cert_applied
 
 
+@timed('manage_dtr_certs')
 def manage_dtr_certs():
     logger.info("DTR certificate management started...")
 
     cert_applied = False
     if generate_dtr_certs() or config['certbot']['always_apply_certs']['dtr']:
-        cert_applied = True
-
         logger.info("Applying DTR certificates")
-        apply_dtr_certs()
-        logger.info("DTR certificates applied")
+
+        if apply_dtr_certs() is not None:
+            cert_applied = True
+            logger.info("DTR certificates applied")
 
     logger.info("DTR certificate management complete")
 
     return cert_applied
 
 
+@timed('manage_ucp_certs')
 def manage_ucp_certs():
     logger.info("UPC certificate management started...")
 
     cert_applied = False
     if generate_ucp_certs() or config['certbot']['always_apply_certs']['ucp']:
-        cert_applied = True
-
         logger.info("Applying UCP certificates")
-        apply_ucp_certs()
-        logger.info("UCP certificates applied")
+
+        if apply_ucp_certs() is not None:
+            cert_applied = True
+            logger.info("UCP certificates applied")
 
     logger.info("UCP certificate management complete")
 
     return cert_applied
 
 
+def shared_account_exists():
+    return any('regr.json' in files for directory, subdirectories, files in os.walk(shared_accounts_directory()))
+
+
+def shared_accounts_directory():
+    return f"{path}/../certs/certbot/accounts"
+
+
+def shared_component(cert_name):
+    return f"fleet/{cert_name}"
+
+
+def watched_directories():
+    # Renewals made outside of this process, for example by certbot's own timer, repoint the symlinks under live/
+    return [f"{certbot_directory(component, 'config')}/live" for component in ['dtr', 'ucp']]
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--conf_dir", help="Configuration directory to use")
+    parser.add_argument("--metrics_json", help="Write a JSON run report to this file")
+    parser.add_argument("--metrics_prometheus", help="Write a Prometheus textfile to this file")
     args = parser.parse_args()
 
     config = ConfigLoader(args.conf_dir).load()
     logger = Logger(filename=__file__,
-                    log_level=config['logging']['log_level'])
+                    log_level=config['logging']['log_level'],
+                    log_format=config['logging'].get('log_format', 'text'))
+
+    try:
+        manage_certs()
+
+    finally:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
 
-    manage_certs()
+        if args.metrics_prometheus:
+            metrics.write_prometheus(args.metrics_prometheus)
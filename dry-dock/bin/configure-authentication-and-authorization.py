@@ -1,15 +1,23 @@
 import argparse
 import base64
 import collections
-import re
+import collections.abc
+import copy
+import hashlib
 import toml
 
 from config_loader import ConfigLoader
+from ldap_profiler import LdapProfiler
 from logger import Logger
+from metrics import Metrics, timed
+from rollout_watcher import RolloutWatcher
+from token_cache import TokenCache
 from ucp_api import UcpApi
+from versioned_config import latest_config
 
 config = None
 logger = None
+metrics = Metrics()
 ucp_api = None
 
 
@@ -17,37 +25,58 @@ ucp_api = None
 # Reference: https://docs.docker.com/ee/ucp/admin/configure/external-auth/enable-ldap-config-file/
 #
 
+@timed('configure_authentication_and_authorization')
 def configure_authentication_and_authorization():
     global config
     global ucp_api
 
     logger.info("Starting LDAP configuration")
 
-    ucp_api = UcpApi(endpoint=config['ucp']['endpoint'],
-                     username=config['ucp']['username'],
-                     password=config['ucp']['password'],
-                     use_ssl=config['ucp']['use_ssl'],
-                     verify_ssl=config['ucp']['verify_ssl'],
-                     logger=logger)
+    if ucp_api is None:
+        ucp_api = UcpApi(endpoint=config['ucp']['endpoint'],
+                         username=config['ucp']['username'],
+                         password=config['ucp']['password'],
+                         use_ssl=config['ucp']['use_ssl'],
+                         verify_ssl=config['ucp']['verify_ssl'],
+                         logger=logger,
+                         metrics=metrics,
+                         token_cache=TokenCache.from_config(config['ucp']))
 
     ucp_api.login()
 
     current_config = find_current_config()
-    new_config = create_new_ucp_config(current_config)
+    current_config_data, new_config_data = modify_config_data(current_config)
 
     ucp_agent_service = find_ucp_agent_service()
-    update_ucp_agent_service_config(ucp_agent_service, new_config)
+
+    if config_digest(current_config_data) == config_digest(new_config_data):
+        result = 'unchanged'
+
+        logger.info(f"LDAP settings are unchanged, keeping {current_config['Spec']['Name']}")
+
+        if service_config_id(ucp_agent_service) != current_config['ID']:
+            result = 'updated'
+
+            logger.info(f"ucp-agent is not using {current_config['Spec']['Name']}")
+            update_ucp_agent_service_config(ucp_agent_service, current_config)
+            wait_for_ucp_agent_rollout(ucp_agent_service)
+    else:
+        result = 'updated'
+
+        new_config = create_new_ucp_config(current_config, new_config_data)
+        update_ucp_agent_service_config(ucp_agent_service, new_config)
+        wait_for_ucp_agent_rollout(ucp_agent_service)
 
     ucp_api.logout()
 
-    logger.info("LDAP configuration complete")
+    logger.info(f"LDAP configuration complete ({result})")
 
-    return
+    return result
 
 
 def update(orig_dict, update_dict):
     for key, value in update_dict.items():
-        if isinstance(value, collections.Mapping):
+        if isinstance(value, collections.abc.Mapping):
             orig_dict[key] = update(orig_dict.get(key, {}), value)
         else:
             orig_dict[key] = value
@@ -55,22 +84,23 @@ def update(orig_dict, update_dict):
     return orig_dict
 
 
+@timed('find_current_config')
 def find_current_config():
     logger.info("Finding latest com.docker.ucp.config")
 
     filter = '{"name":["com.docker.ucp.config"]}'
 
-    configs = ucp_api.find_configs(filter)
+    configs = ucp_api.iter_configs(filter, fields=['ID', 'Spec.Name', 'Version'])
 
-    config_file = {}
-    for config_entry in configs:
-        config_file[config_entry['Spec']['Name']] = config_entry
+    latest = latest_config(configs, 'com.docker.ucp.config')
 
-    latest = natural_sort(config_file.keys())[-1]
+    if latest is None:
+        raise Exception("No com.docker.ucp.config found")
 
-    return config_file[latest]
+    return ucp_api.get_config(latest['ID'])
 
 
+@timed('find_ucp_agent_service')
 def find_ucp_agent_service():
     logger.info("Finding latest ucp-agent service")
 
@@ -89,22 +119,46 @@ def find_ucp_agent_service():
     return ucp_agent_service.pop()
 
 
+@timed('modify_config_data')
 def modify_config_data(current_config):
     logger.info("Modifying LDAP settings")
 
     prev_config_data = toml.loads(base64.b64decode(current_config['Spec']['Data']).decode('utf-8'))
 
-    new_config_data = update(prev_config_data, config['auth'])
-    new_config_data_toml = toml.dumps(new_config_data)
-    new_config_data_toml_base64 = base64.b64encode(new_config_data_toml.encode('utf-8')).decode('utf-8')
+    new_config_data = update(copy.deepcopy(prev_config_data), config['auth'])
+
+    return prev_config_data, new_config_data
+
+
+def canonicalize(value):
+    if isinstance(value, collections.abc.Mapping):
+        return collections.OrderedDict((key, canonicalize(value[key])) for key in sorted(value))
+    elif isinstance(value, list):
+        return [canonicalize(entry) for entry in value]
 
-    return new_config_data_toml_base64
+    return value
+
+
+def config_digest(config_data):
+    canonical_toml = toml.dumps(canonicalize(config_data))
+
+    return hashlib.sha256(canonical_toml.encode('utf-8')).hexdigest()
+
+
+def service_config_id(service):
+    configs = service['Spec']['TaskTemplate']['ContainerSpec']['Configs']
+
+    return next(
+        (entry['ConfigID'] for entry in configs if entry['ConfigName'].startswith('com.docker.ucp.config-')),
+        None)
 
 
-def create_new_ucp_config(current_config):
+@timed('create_new_ucp_config')
+def create_new_ucp_config(current_config, new_config_data):
     logger.info("Creating new com.docker.ucp.config")
 
-    new_config_data = modify_config_data(current_config)
+    new_config_data_toml = toml.dumps(new_config_data)
+    new_config_data = base64.b64encode(new_config_data_toml.encode('utf-8')).decode('utf-8')
 
     current_config_number = current_config['Spec']['Name'].split('-')[1]
     new_config_number = int(current_config_number) + 1
@@ -121,6 +175,7 @@ def create_new_ucp_config(current_config):
     return new_config
 
 
+@timed('update_ucp_agent_service_config')
 def update_ucp_agent_service_config(service, new_config):
     logger.info("Applying new com.docker.ucp.config to ucp-agent")
 
@@ -138,19 +193,69 @@ def update_ucp_agent_service_config(service, new_config):
     return response_json
 
 
-def natural_sort(list_to_sort):
-    convert = lambda text: int(text) if text.isdigit() else text.lower()
-    alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
-    return sorted(list_to_sort, key=alphanum_key)
+@timed('wait_for_ucp_agent_rollout')
+def wait_for_ucp_agent_rollout(service):
+    rollout_watcher = RolloutWatcher.from_config(config['ucp'], ucp_api, logger)
+
+    if rollout_watcher is None:
+        return None
+
+    logger.info("Waiting for the ucp-agent rollout to converge")
+
+    return rollout_watcher.wait(service['ID'])
+
+
+@timed('profile_ldap_search')
+def profile_ldap_search():
+    logger.info("Profiling the LDAP user search")
+
+    ldap_profiler = LdapProfiler(config['auth']['ldap'], config['auth']['user_search_configs'])
+
+    report = ldap_profiler.profile()
+
+    for mode in ['filter_search', 'group_iterate']:
+        if report[mode] is not None:
+            logger.info("%s: %d entries, %d matched, %d request(s), %d page(s), %.3fs", mode,
+                        report[mode]['entries'], report[mode]['matched'], report[mode]['requests'],
+                        report[mode]['pages'], report[mode]['latency'])
+
+    recommendation = report['recommendation']
+
+    logger.info("Recommended match_group_iterate: %s - %s",
+                recommendation['match_group_iterate'], recommendation['reason'])
+
+    configured = bool(config['auth']['user_search_configs'].get('match_group_iterate'))
+
+    if configured != recommendation['match_group_iterate']:
+        logger.warning("auth.yml sets match_group_iterate to %s, which is the slower search", configured)
+
+    return report
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--conf_dir", help="Configuration directory to use")
+    parser.add_argument("--preflight", action='store_true',
+                        help="Profile the LDAP user search both ways and recommend match_group_iterate, "
+                             "without changing UCP")
+    parser.add_argument("--metrics_json", help="Write a JSON run report to this file")
+    parser.add_argument("--metrics_prometheus", help="Write a Prometheus textfile to this file")
     args = parser.parse_args()
 
     config = ConfigLoader(args.conf_dir).load()
     logger = Logger(filename=__file__,
-                    log_level=config['logging']['log_level'])
+                    log_level=config['logging']['log_level'],
+                    log_format=config['logging'].get('log_format', 'text'))
+
+    try:
+        if args.preflight:
+            profile_ldap_search()
+        else:
+            configure_authentication_and_authorization()
+
+    finally:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
 
-    configure_authentication_and_authorization()
+        if args.metrics_prometheus:
+            metrics.write_prometheus(args.metrics_prometheus)
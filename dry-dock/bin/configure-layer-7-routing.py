@@ -1,26 +1,41 @@
 import argparse
+import base64
+import toml
 
 from config_loader import ConfigLoader
+from downtime_probe import DowntimeProbe
 from logger import Logger
+from metrics import Metrics, timed
+from rollout_watcher import RolloutWatcher
+from token_cache import TokenCache
 from ucp_api import UcpApi
+from versioned_config import config_number, latest_config
+
+DEFAULT_PROBE_TIMEOUT = 300
+INTERLOCK_CONFIG_PREFIX = 'com.docker.ucp.interlock.conf'
 
 config = None
 logger = None
+metrics = Metrics()
 ucp_api = None
 
 
+@timed('configure_layer_7_routing')
 def configure_layer_7_routing():
     global config
     global ucp_api
 
     logger.info("Starting Layer 7 routing configuration")
 
-    ucp_api = UcpApi(endpoint=config['ucp']['endpoint'],
-                     username=config['ucp']['username'],
-                     password=config['ucp']['password'],
-                     use_ssl=config['ucp']['use_ssl'],
-                     verify_ssl=config['ucp']['verify_ssl'],
-                     logger=logger)
+    if ucp_api is None:
+        ucp_api = UcpApi(endpoint=config['ucp']['endpoint'],
+                         username=config['ucp']['username'],
+                         password=config['ucp']['password'],
+                         use_ssl=config['ucp']['use_ssl'],
+                         verify_ssl=config['ucp']['verify_ssl'],
+                         logger=logger,
+                         metrics=metrics,
+                         token_cache=TokenCache.from_config(config['ucp']))
 
     ucp_api.login()
 
@@ -31,47 +46,213 @@ def configure_layer_7_routing():
 
     logger.info("Interlock configuration retrieved")
 
-    create_request = True
-    if get_response_json['InterlockEnabled']:
-        if get_response_json['HTTPPort'] == config['interlock']['http_port'] and \
+    downtime_probe = start_downtime_probe(get_response_json)
+
+    try:
+        if not get_response_json['InterlockEnabled']:
+            result = 'created'
+
+            create_interlock()
+        elif get_response_json['HTTPPort'] == config['interlock']['http_port'] and \
                 get_response_json['HTTPSPort'] == config['interlock']['https_port'] and \
                 get_response_json['Arch'] == config['interlock']['architecture']:
-            create_request = False
+            result = 'unchanged'
 
             logger.info("Interlock is already enabled and configured with the specified parameters")
-            logger.debug(f"get_response_json: {get_response_json}, config['interlock']: {config['interlock']}")
+            logger.debug("get_response_json: %s, config['interlock']: %s", get_response_json, config['interlock'])
+        elif get_response_json['Arch'] == config['interlock']['architecture'] and update_interlock_ports():
+            result = 'updated'
         else:
+            result = 'recreated'
+
+            # The architecture selects the Interlock images, so it can only be changed by recreating Interlock
             logger.info("Existing Interlock configuration does not match specified parameters, "
                         "removing existing Interlock configuration")
-            logger.debug(f"get_response_json: {get_response_json}, config['interlock']: {config['interlock']}")
+            logger.debug("get_response_json: %s, config['interlock']: %s", get_response_json, config['interlock'])
 
             delete_response = ucp_api.delete_interlock()
 
             logger.info("Existing Interlock configuration removed")
 
-    if create_request:
-        logger.info("Creating Interlock configured with the specified parameters")
-        logger.debug(f"config['interlock']: {config['interlock']}")
+            create_interlock()
 
-        create_response = ucp_api.create_interlock(http_port=config['interlock']['http_port'],
-                                                   https_port=config['interlock']['https_port'],
-                                                   arch=config['interlock']['architecture'])
-        logger.info("Interlock configuration created")
+    finally:
+        if downtime_probe is not None:
+            stop_downtime_probe(downtime_probe)
 
     ucp_api.logout()
 
-    logger.info("Layer 7 routing configuration complete")
+    logger.info("Layer 7 routing configuration complete (%s)", result)
+
+    return result
+
+
+def create_interlock():
+    logger.info("Creating Interlock configured with the specified parameters")
+    logger.debug("config['interlock']: %s", config['interlock'])
+
+    create_response = ucp_api.create_interlock(http_port=config['interlock']['http_port'],
+                                               https_port=config['interlock']['https_port'],
+                                               arch=config['interlock']['architecture'])
+    logger.info("Interlock configuration created")
+
+    return create_response
+
+
+@timed('find_interlock_service')
+def find_interlock_service():
+    logger.info("Finding ucp-interlock service")
+
+    services = ucp_api.find_services('{"name":["ucp-interlock"]}')
+
+    return next((service for service in services if service['Spec']['Name'] == 'ucp-interlock'), None)
+
+
+def interlock_config_index(service):
+    configs = service['Spec']['TaskTemplate']['ContainerSpec'].get('Configs') or []
+
+    return next((index for (index, entry) in enumerate(configs)
+                 if config_number(entry['ConfigName'], INTERLOCK_CONFIG_PREFIX) is not None), None)
+
+
+@timed('update_interlock_ports')
+def update_interlock_ports():
+    interlock_service = find_interlock_service()
+
+    if interlock_service is None or interlock_config_index(interlock_service) is None:
+        logger.info("ucp-interlock does not use a com.docker.ucp.interlock.conf, Interlock has to be recreated")
+        return False
+
+    configs = interlock_service['Spec']['TaskTemplate']['ContainerSpec']['Configs']
+    config_index = interlock_config_index(interlock_service)
+
+    current_config = ucp_api.get_config(configs[config_index]['ConfigID'])
+    config_data = toml.loads(base64.b64decode(current_config['Spec']['Data']).decode('utf-8'))
+
+    if not config_data.get('Extensions'):
+        logger.info("%s has no extensions, Interlock has to be recreated", current_config['Spec']['Name'])
+        return False
+
+    if all(extension.get('PublishedPort') == config['interlock']['http_port'] and
+           extension.get('PublishedSSLPort') == config['interlock']['https_port']
+           for extension in config_data['Extensions'].values()):
+        logger.info("%s already publishes the specified ports", current_config['Spec']['Name'])
+    else:
+        update_interlock_config(interlock_service, config_index, config_data)
+
+    update_interlock_settings()
+
+    return True
+
+
+def update_interlock_config(interlock_service, config_index, config_data):
+    # Interlock reconfigures the proxy service with a rolling update, so routing keeps being served
+    logger.info("Updating the published ports of the Interlock proxy in place")
+
+    for extension in config_data['Extensions'].values():
+        extension['PublishedPort'] = config['interlock']['http_port']
+        extension['PublishedSSLPort'] = config['interlock']['https_port']
+
+    configs = ucp_api.iter_configs(f'{{"name":["{INTERLOCK_CONFIG_PREFIX}"]}}', fields=['ID', 'Spec.Name'])
+    latest = latest_config(configs, INTERLOCK_CONFIG_PREFIX)
+    new_config_name = f"{INTERLOCK_CONFIG_PREFIX}-{config_number(latest['Spec']['Name'], INTERLOCK_CONFIG_PREFIX) + 1}"
+
+    new_config_data = base64.b64encode(toml.dumps(config_data).encode('utf-8')).decode('utf-8')
 
-    return
+    response_json = ucp_api.create_config({'Name': new_config_name,
+                                           'Data': new_config_data})
+
+    logger.debug("Created %s with ID %s", new_config_name, response_json['ID'])
+
+    body = interlock_service['Spec']
+    body['TaskTemplate']['ContainerSpec']['Configs'][config_index]['ConfigID'] = response_json['ID']
+    body['TaskTemplate']['ContainerSpec']['Configs'][config_index]['ConfigName'] = new_config_name
+
+    ucp_api.update_service(interlock_service, body)
+
+    logger.info("ucp-interlock updated to use %s", new_config_name)
+
+    wait_for_interlock_rollout(interlock_service)
+
+
+@timed('update_interlock_settings')
+def update_interlock_settings():
+    # UCP reports the ports it was last given rather than the ones in the conf, the next run compares against them
+    logger.info("Updating the Interlock settings reported by UCP")
+
+    ucp_api.update_interlock(http_port=config['interlock']['http_port'],
+                             https_port=config['interlock']['https_port'],
+                             arch=config['interlock']['architecture'])
+
+
+@timed('wait_for_interlock_rollout')
+def wait_for_interlock_rollout(service):
+    rollout_watcher = RolloutWatcher.from_config(config['ucp'], ucp_api, logger)
+
+    if rollout_watcher is None:
+        return None
+
+    logger.info("Waiting for the ucp-interlock rollout to converge")
+
+    return rollout_watcher.wait(service['ID'])
+
+
+def start_downtime_probe(interlock):
+    probe_host = config['interlock'].get('probe_host')
+
+    if not probe_host:
+        return None
+
+    # Until the change is done, routing counts as up while either the current or the configured ports answer
+    targets = [(probe_host, config['interlock']['http_port']), (probe_host, config['interlock']['https_port'])]
+    if interlock.get('InterlockEnabled'):
+        targets.extend([(probe_host, interlock['HTTPPort']), (probe_host, interlock['HTTPSPort'])])
+
+    downtime_probe = DowntimeProbe(targets=list(dict.fromkeys(targets)))
+    downtime_probe.start()
+
+    return downtime_probe
+
+
+def stop_downtime_probe(downtime_probe):
+    probe_host = config['interlock']['probe_host']
+    probe_timeout = config['interlock'].get('probe_timeout', DEFAULT_PROBE_TIMEOUT)
+
+    targets = [(probe_host, config['interlock']['http_port']), (probe_host, config['interlock']['https_port'])]
+
+    if not downtime_probe.wait_until_serving(targets, probe_timeout):
+        logger.warning("Interlock is not serving on %s ports %s and %s after %s seconds", probe_host,
+                       config['interlock']['http_port'], config['interlock']['https_port'], probe_timeout)
+
+    downtime_probe.stop()
+
+    report = downtime_probe.report()
+    metrics.record_step('interlock_downtime', report['downtime'], 'success' if report['failures'] == 0 else 'failure')
+
+    logger.info("Layer 7 routing downtime: %.2fs over %d outage(s), %d of %d probes failed", report['downtime'],
+                report['outages'], report['failures'], report['probes'])
+
+    return report
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--conf_dir", help="Configuration directory to use")
+    parser.add_argument("--metrics_json", help="Write a JSON run report to this file")
+    parser.add_argument("--metrics_prometheus", help="Write a Prometheus textfile to this file")
     args = parser.parse_args()
 
     config = ConfigLoader(args.conf_dir).load()
     logger = Logger(filename=__file__,
-                    log_level=config['logging']['log_level'])
+                    log_level=config['logging']['log_level'],
+                    log_format=config['logging'].get('log_format', 'text'))
+
+    try:
+        configure_layer_7_routing()
+
+    finally:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
 
-    configure_layer_7_routing()
+        if args.metrics_prometheus:
+            metrics.write_prometheus(args.metrics_prometheus)
@@ -0,0 +1,37 @@
+import argparse
+
+from task import Task
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='dry-dock')
+    subparsers = parser.add_subparsers(dest='task', metavar='{' + ','.join(Task.names()) + '}')
+    subparsers.required = True
+
+    for task_name in Task.names():
+        subparser = subparsers.add_parser(task_name, help=f"Run {Task(task_name, None).script_name}")
+        subparser.add_argument("--conf_dir", required=True, help="Configuration directory to use")
+        subparser.add_argument("--metrics_json", help="Write a JSON run report to this file")
+        subparser.add_argument("--metrics_prometheus", help="Write a Prometheus textfile to this file")
+
+        if task_name == 'config-gc':
+            subparser.add_argument("--dry_run", action='store_true', default=None,
+                                   help="Only list the configs that would be deleted")
+
+    args = parser.parse_args()
+
+    # Only the selected task's script is imported, so its dependencies are never loaded for another subcommand
+    task = Task(args.task, args.conf_dir)
+    module = task.load()
+
+    if args.task == 'config-gc':
+        module.dry_run = args.dry_run
+
+    try:
+        task.run()
+
+    finally:
+        if args.metrics_json:
+            module.metrics.write_json(args.metrics_json)
+
+        if args.metrics_prometheus:
+            module.metrics.write_prometheus(args.metrics_prometheus)
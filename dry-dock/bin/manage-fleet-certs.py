@@ -0,0 +1,43 @@
+import argparse
+import sys
+
+from cert_planner import CertPlanner
+from fleet import Fleet
+from logger import Logger
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conf_dir", nargs='+', required=True,
+                        help="Configuration directories to use, glob patterns are expanded relative to conf/")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Maximum number of certificates issued, and of clusters updated, concurrently")
+    parser.add_argument("--plan", action='store_true', help="Only log which certificates would be issued and where")
+    parser.add_argument("--log_level", default='INFO', help="Log level for the fleet summary")
+    parser.add_argument("--log_format", choices=['json', 'text'], default='text', help="Log format for the fleet summary")
+    args = parser.parse_args()
+
+    logger = Logger(filename=__file__,
+                    log_level=args.log_level,
+                    log_format=args.log_format)
+
+    conf_dirs = Fleet(task_name='certs', conf_dirs=args.conf_dir, logger=logger).conf_dirs
+
+    cert_planner = CertPlanner(conf_dirs=conf_dirs,
+                               workers=args.workers,
+                               logger=logger)
+
+    certificates = cert_planner.plan()
+
+    for certificate in certificates:
+        targets = [f"{conf_dir} {component.upper()}" for conf_dir, component in certificate['targets']]
+
+        logger.info(f"{certificate['cert_name']}: {', '.join(certificate['domains'])} - issued with "
+                    f"{certificate['issuer']}/certbot.yml for {', '.join(targets)}")
+
+    if args.plan:
+        sys.exit(0)
+
+    results = cert_planner.run(certificates)
+
+    if any(result['status'] != 'success' for result in results):
+        sys.exit(1)
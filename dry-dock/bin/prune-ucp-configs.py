@@ -0,0 +1,85 @@
+import argparse
+
+from config_loader import ConfigLoader
+from config_retention import ConfigRetention
+from logger import Logger
+from metrics import Metrics, timed
+from token_cache import TokenCache
+from ucp_api import UcpApi
+
+config = None
+dry_run = None
+logger = None
+metrics = Metrics()
+ucp_api = None
+
+
+@timed('prune_ucp_configs')
+def prune_ucp_configs():
+    global config
+    global ucp_api
+
+    logger.info("Starting com.docker.ucp config pruning")
+
+    if ucp_api is None:
+        ucp_api = UcpApi(endpoint=config['ucp']['endpoint'],
+                         username=config['ucp']['username'],
+                         password=config['ucp']['password'],
+                         use_ssl=config['ucp']['use_ssl'],
+                         verify_ssl=config['ucp']['verify_ssl'],
+                         logger=logger,
+                         metrics=metrics,
+                         token_cache=TokenCache.from_config(config['ucp']))
+
+    config_retention = ConfigRetention.from_config(config['ucp'], ucp_api, logger)
+
+    if config_retention is None and not dry_run:
+        logger.info("config_retention is not enabled in ucp.yml, no configs are pruned")
+        return {}
+    elif config_retention is None:
+        # A dry run only lists configs, so it shows what the defaults would delete
+        config_retention = ConfigRetention(ucp_api, logger=logger)
+
+    if dry_run is not None:
+        config_retention.dry_run = dry_run
+
+    ucp_api.login()
+
+    results = config_retention.run()
+
+    ucp_api.logout()
+
+    deleted = sum(len(result['deleted']) for result in results.values())
+    failed = sum(len(result['failed']) for result in results.values())
+
+    outcome = 'to delete' if config_retention.dry_run else 'deleted'
+
+    logger.info("com.docker.ucp config pruning complete (%s %s, %s failed)", deleted, outcome, failed)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conf_dir", help="Configuration directory to use")
+    parser.add_argument("--dry_run", action='store_true', default=None,
+                        help="Only list the configs that would be deleted")
+    parser.add_argument("--metrics_json", help="Write a JSON run report to this file")
+    parser.add_argument("--metrics_prometheus", help="Write a Prometheus textfile to this file")
+    args = parser.parse_args()
+
+    config = ConfigLoader(args.conf_dir).load()
+    dry_run = args.dry_run
+    logger = Logger(filename=__file__,
+                    log_level=config['logging']['log_level'],
+                    log_format=config['logging'].get('log_format', 'text'))
+
+    try:
+        prune_ucp_configs()
+
+    finally:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+
+        if args.metrics_prometheus:
+            metrics.write_prometheus(args.metrics_prometheus)
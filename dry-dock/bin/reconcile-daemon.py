@@ -0,0 +1,36 @@
+import argparse
+import signal
+
+from config_loader import ConfigLoader
+from logger import Logger
+from reconciler import Reconciler
+from task import Task
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conf_dir", required=True, help="Configuration directory to use")
+    parser.add_argument("--tasks", nargs='+', choices=Task.names(), default=Task.names(),
+                        help="Tasks to reconcile, defaults to all of them")
+    parser.add_argument("--resync_interval", type=int, default=Reconciler.DEFAULT_RESYNC_INTERVAL,
+                        help="Seconds between full reconciles of every task, whether or not anything changed")
+    args = parser.parse_args()
+
+    config = ConfigLoader(args.conf_dir, 'logging').load()
+    logger = Logger(filename=__file__,
+                    log_level=config['logging']['log_level'],
+                    log_format=config['logging'].get('log_format', 'text'))
+
+    reconciler = Reconciler(conf_dir=args.conf_dir,
+                            task_names=args.tasks,
+                            resync_interval=args.resync_interval,
+                            logger=logger)
+
+    signal.signal(signal.SIGINT, lambda signum, frame: reconciler.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: reconciler.stop())
+
+    logger.info("Watching %s for %s, full resync every %ss", args.conf_dir, ', '.join(args.tasks),
+                args.resync_interval)
+
+    reconciler.run()
+
+    logger.info("Reconcile daemon stopped")
@@ -0,0 +1,33 @@
+import argparse
+import sys
+
+from fleet import Fleet
+from logger import Logger
+from task import Task
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--task", choices=Task.names(), required=True, help="Task to run on every cluster")
+    parser.add_argument("--conf_dir", nargs='+', required=True,
+                        help="Configuration directories to use, glob patterns are expanded relative to conf/")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum number of clusters configured concurrently")
+    parser.add_argument("--executor", choices=['process', 'thread'], default='process',
+                        help="Run each cluster in a worker process or a worker thread")
+    parser.add_argument("--log_level", default='INFO', help="Log level for the fleet summary")
+    parser.add_argument("--log_format", choices=['json', 'text'], default='text', help="Log format for the fleet summary")
+    args = parser.parse_args()
+
+    logger = Logger(filename=__file__,
+                    log_level=args.log_level,
+                    log_format=args.log_format)
+
+    fleet = Fleet(task_name=args.task,
+                  conf_dirs=args.conf_dir,
+                  workers=args.workers,
+                  executor=args.executor,
+                  logger=logger)
+
+    results = fleet.run()
+
+    if any(result['status'] != 'success' for result in results):
+        sys.exit(1)
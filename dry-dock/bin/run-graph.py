@@ -0,0 +1,60 @@
+import argparse
+import sys
+
+from config_loader import ConfigLoader
+from exception.unsupported_task_error import UnsupportedTaskError
+from logger import Logger
+from task import Task
+from task_graph import TaskGraph
+
+
+def parse_dependencies(values):
+    dependencies = {}
+
+    for value in values:
+        task_name, _, dependency = value.partition(':')
+
+        for name in [task_name, dependency]:
+            if name not in Task.names():
+                raise UnsupportedTaskError(name)
+
+        dependencies.setdefault(task_name, []).append(dependency)
+
+    return dependencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conf_dir", required=True, help="Configuration directory to use")
+    parser.add_argument("--tasks", nargs='+', choices=Task.names(), default=Task.names(),
+                        help="Tasks to run, defaults to all of them")
+    parser.add_argument("--depends", nargs='*', metavar='TASK:DEPENDENCY',
+                        help="Replaces the default dependencies, for example l7-routing:auth")
+    parser.add_argument("--workers", type=int, help="Maximum number of tasks run concurrently")
+    parser.add_argument("--metrics_json", help="Write a JSON run report to this file")
+    parser.add_argument("--metrics_prometheus", help="Write a Prometheus textfile to this file")
+    args = parser.parse_args()
+
+    config = ConfigLoader(args.conf_dir, 'logging').load()
+    logger = Logger(filename=__file__,
+                    log_level=config['logging']['log_level'],
+                    log_format=config['logging'].get('log_format', 'text'))
+
+    task_graph = TaskGraph(conf_dir=args.conf_dir,
+                           task_names=args.tasks,
+                           dependencies=parse_dependencies(args.depends) if args.depends is not None else None,
+                           workers=args.workers,
+                           logger=logger)
+
+    try:
+        results = task_graph.run()
+
+    finally:
+        if args.metrics_json:
+            task_graph.metrics.write_json(args.metrics_json)
+
+        if args.metrics_prometheus:
+            task_graph.metrics.write_prometheus(args.metrics_prometheus)
+
+    if any(result['status'] != 'success' for result in results):
+        sys.exit(1)
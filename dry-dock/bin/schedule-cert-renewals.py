@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+
+from fleet import Fleet
+from logger import Logger
+from renewal_scheduler import RenewalScheduler
+
+path = os.path.dirname(os.path.realpath(__file__))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conf_dir", nargs='+', required=True,
+                        help="Configuration directories to use, glob patterns are expanded relative to conf/")
+    parser.add_argument("--queue", default=f"{path}/../certs/renewal-queue.json",
+                        help="File the renewal queue and the order history are kept in")
+    parser.add_argument("--window_days", type=float, default=RenewalScheduler.DEFAULT_WINDOW_DAYS,
+                        help="Number of days renewals that become due together are spread over")
+    parser.add_argument("--registered_domain_limit", type=int,
+                        default=RenewalScheduler.DEFAULT_REGISTERED_DOMAIN_LIMIT,
+                        help="Maximum number of orders for one registered domain per period")
+    parser.add_argument("--registered_domain_period_hours", type=float,
+                        default=RenewalScheduler.DEFAULT_REGISTERED_DOMAIN_PERIOD / 3600,
+                        help="Period of the registered domain limit")
+    parser.add_argument("--global_limit", type=int, default=RenewalScheduler.DEFAULT_GLOBAL_LIMIT,
+                        help="Maximum number of orders per period")
+    parser.add_argument("--global_period_hours", type=float, default=RenewalScheduler.DEFAULT_GLOBAL_PERIOD / 3600,
+                        help="Period of the global limit")
+    parser.add_argument("--initial_backoff_minutes", type=float,
+                        default=RenewalScheduler.DEFAULT_INITIAL_BACKOFF / 60,
+                        help="Delay before the first retry of a failed renewal, doubled on every further failure")
+    parser.add_argument("--max_backoff_hours", type=float, default=RenewalScheduler.DEFAULT_MAX_BACKOFF / 3600,
+                        help="Upper limit of the retry delay")
+    parser.add_argument("--plan", action='store_true', help="Only log when each certificate is scheduled for renewal")
+    parser.add_argument("--log_level", default='INFO', help="Log level for the scheduler")
+    parser.add_argument("--log_format", choices=['json', 'text'], default='text', help="Log format for the scheduler")
+    args = parser.parse_args()
+
+    logger = Logger(filename=__file__,
+                    log_level=args.log_level,
+                    log_format=args.log_format)
+
+    renewal_scheduler = RenewalScheduler(queue_path=args.queue,
+                                         conf_dirs=Fleet(task_name='certs', conf_dirs=args.conf_dir).conf_dirs,
+                                         window_days=args.window_days,
+                                         registered_domain_limit=args.registered_domain_limit,
+                                         registered_domain_period=args.registered_domain_period_hours * 3600,
+                                         global_limit=args.global_limit,
+                                         global_period=args.global_period_hours * 3600,
+                                         initial_backoff=args.initial_backoff_minutes * 60,
+                                         max_backoff=args.max_backoff_hours * 3600,
+                                         logger=logger)
+
+    if args.plan:
+        for entry in renewal_scheduler.plan():
+            expires = time.ctime(entry['not_after']) if entry['not_after'] is not None else 'never issued'
+
+            logger.info(f"[{entry['conf_dir']}] {entry['component'].upper()} {', '.join(entry['domains'])} - "
+                        f"expires {expires}, renewal scheduled for {time.ctime(entry['scheduled'])}, "
+                        f"{entry['attempts']} failed attempt(s)")
+
+        sys.exit(0)
+
+    results = renewal_scheduler.run()
+
+    if any(result['status'] == 'failure' for result in results):
+        sys.exit(1)
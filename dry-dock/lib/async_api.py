@@ -0,0 +1,29 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from http_session import HttpSession
+
+
+class AsyncApi:
+    DEFAULT_WORKERS = HttpSession.DEFAULT_POOL_MAXSIZE
+
+    def __init__(self, api, executor=None, loop=None, workers=DEFAULT_WORKERS):
+        # Calls run on at most workers threads, and the shared connection pool holds as many connections, so
+        # concurrent calls reuse their connections instead of opening new ones
+        self.api = api
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=workers)
+        self.loop = loop
+
+        HttpSession.reserve(workers)
+
+        return
+
+    @property
+    def endpoint(self):
+        return self.api.endpoint
+
+    async def _run(self, method, *args, **kwargs):
+        loop = self.loop if self.loop is not None else asyncio.get_event_loop()
+
+        return await loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
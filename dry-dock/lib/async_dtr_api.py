@@ -0,0 +1,31 @@
+from async_api import AsyncApi
+from dtr_api import DtrApi
+
+
+class AsyncDtrApi(AsyncApi):
+
+    def __init__(self, endpoint, username, password, use_ssl=True, verify_ssl=True, logger=None,
+                 session=None, token_cache=None, metrics=None, executor=None, loop=None,
+                 workers=AsyncApi.DEFAULT_WORKERS):
+        api = DtrApi(endpoint=endpoint,
+                     username=username,
+                     password=password,
+                     use_ssl=use_ssl,
+                     verify_ssl=verify_ssl,
+                     logger=logger,
+                     session=session,
+                     token_cache=token_cache,
+                     metrics=metrics)
+
+        super().__init__(api, executor=executor, loop=loop, workers=workers)
+
+        return
+
+    async def update_certs(self, body):
+        return await self._run(self.api.update_certs, body)
+
+    async def create_token(self, token_label):
+        return await self._run(self.api.create_token, token_label)
+
+    async def delete_token(self):
+        return await self._run(self.api.delete_token)
@@ -0,0 +1,85 @@
+import asyncio
+import collections
+import os
+import subprocess
+
+from exception.command_cancelled_error import CommandCancelledError
+from exception.command_timeout_error import CommandTimeoutError
+
+
+class AsyncExecuteCommand:
+
+    def __init__(self, command, environment=None, logger=None, timeout=None, max_lines=None, cancel_event=None):
+        self.command = command
+        self.environment = environment
+        self.logger = logger
+        self.timeout = timeout
+        self.max_lines = max_lines
+        self.cancel_event = cancel_event
+
+        self.result = None
+
+        return
+
+    async def run(self):
+        params = {'stderr': asyncio.subprocess.PIPE,
+                  'stdout': asyncio.subprocess.PIPE}
+
+        if self.environment:
+            if 'PATH' not in self.environment:
+                self.environment['PATH'] = os.environ['PATH']
+
+            params['env'] = self.environment
+
+        # Only the last max_lines lines of each stream are kept, everything is forwarded to the logger as it arrives
+        stdout = collections.deque(maxlen=self.max_lines)
+        stderr = collections.deque(maxlen=self.max_lines)
+
+        process = await asyncio.create_subprocess_exec(*self.command, **params)
+
+        finished = asyncio.ensure_future(asyncio.gather(self.__forward(process.stdout, stdout, 'stdout'),
+                                                        self.__forward(process.stderr, stderr, 'stderr'),
+                                                        process.wait()))
+        cancelled = asyncio.ensure_future(self.cancel_event.wait()) if self.cancel_event is not None else None
+        waiters = [waiter for waiter in [finished, cancelled] if waiter is not None]
+
+        try:
+            done, pending = await asyncio.wait(waiters, timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if finished not in done:
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    raise CommandCancelledError(f"{self.command[0]} was cancelled")
+
+                raise CommandTimeoutError(f"{self.command[0]} did not finish within {self.timeout} seconds")
+
+        finally:
+            if cancelled is not None and not cancelled.done():
+                cancelled.cancel()
+
+            # Also reached when the awaiting task itself is cancelled
+            if process.returncode is None:
+                process.kill()
+
+            # The streams reach their end once the process is gone, so the last lines are still collected
+            await asyncio.wait([finished])
+
+        finished.result()
+
+        self.result = subprocess.CompletedProcess(self.command, process.returncode, list(stdout), list(stderr))
+
+        return self.result
+
+    async def __forward(self, stream, lines, name):
+        while True:
+            raw_line = await stream.readline()
+
+            if not raw_line:
+                break
+
+            line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+            lines.append(line)
+
+            if self.logger is not None:
+                self.logger.debug("%s %s: %s", os.path.basename(self.command[0]), name, line)
+
+        return
@@ -0,0 +1,68 @@
+from async_api import AsyncApi
+from ucp_api import UcpApi
+
+
+class AsyncUcpApi(AsyncApi):
+    # The iter_* methods are generators that keep a response open between items, so they stay synchronous
+
+    def __init__(self, endpoint, username, password, use_ssl=True, verify_ssl=True, logger=None,
+                 session=None, token_cache=None, metrics=None, executor=None, loop=None,
+                 workers=AsyncApi.DEFAULT_WORKERS):
+        api = UcpApi(endpoint=endpoint,
+                     username=username,
+                     password=password,
+                     use_ssl=use_ssl,
+                     verify_ssl=verify_ssl,
+                     logger=logger,
+                     session=session,
+                     token_cache=token_cache,
+                     metrics=metrics)
+
+        super().__init__(api, executor=executor, loop=loop, workers=workers)
+
+        return
+
+    async def create_config(self, body):
+        return await self._run(self.api.create_config, body)
+
+    async def create_interlock(self, http_port, https_port, arch):
+        return await self._run(self.api.create_interlock, http_port=http_port, https_port=https_port, arch=arch)
+
+    async def delete_config(self, config_id):
+        return await self._run(self.api.delete_config, config_id)
+
+    async def delete_interlock(self):
+        return await self._run(self.api.delete_interlock)
+
+    async def get_config(self, config_id):
+        return await self._run(self.api.get_config, config_id)
+
+    async def get_interlock(self):
+        return await self._run(self.api.get_interlock)
+
+    async def find_configs(self, filters=None):
+        return await self._run(self.api.find_configs, filters)
+
+    async def find_services(self, filters=None):
+        return await self._run(self.api.find_services, filters)
+
+    async def find_tasks(self, filters=None):
+        return await self._run(self.api.find_tasks, filters)
+
+    async def get_service(self, service_id):
+        return await self._run(self.api.get_service, service_id)
+
+    async def login(self):
+        return await self._run(self.api.login)
+
+    async def logout(self):
+        return await self._run(self.api.logout)
+
+    async def update_certs(self, body):
+        return await self._run(self.api.update_certs, body)
+
+    async def update_interlock(self, http_port, https_port, arch):
+        return await self._run(self.api.update_interlock, http_port=http_port, https_port=https_port, arch=arch)
+
+    async def update_service(self, service, body):
+        return await self._run(self.api.update_service, service, body)
@@ -0,0 +1,101 @@
+import os
+import re
+import threading
+
+LINEAGE_FILES = ['cert', 'privkey', 'chain', 'fullchain']
+
+
+class CertLineageIndex:
+
+    def __init__(self, config_dir):
+        self.config_dir = config_dir
+        self.renewal_dir = f"{config_dir}/renewal"
+
+        self.__lineages = {}
+        self.__mtime = None
+        self.__lock = threading.Lock()
+
+        return
+
+    def lineage(self, domain_name):
+        self.refresh()
+
+        lineages = self.__lineages.get(domain_name)
+
+        # certbot names a new lineage <domain>-NNNN when the domain list changes, the highest suffix is the latest
+        return lineages[-1] if lineages else None
+
+    def cert_directory(self, domain_name):
+        lineage = self.lineage(domain_name)
+
+        return lineage['live_dir'] if lineage is not None else None
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.renewal_dir).st_mtime_ns
+
+        except FileNotFoundError:
+            mtime = None
+
+        with self.__lock:
+            # certbot replaces renewal files with a rename, which always updates the directory mtime
+            if mtime == self.__mtime:
+                return False
+
+            self.__lineages = self.__build() if mtime is not None else {}
+            self.__mtime = mtime
+
+        return True
+
+    def __build(self):
+        lineages = {}
+
+        for entry in os.scandir(self.renewal_dir):
+            if not entry.is_file() or not entry.name.endswith('.conf'):
+                continue
+
+            name = entry.name[:-len('.conf')]
+            match = re.fullmatch(r'(?P<domain>.+?)(?:-(?P<suffix>\d{4}))?', name)
+
+            lineage = self.__read(entry.path, name)
+            lineage['suffix'] = int(match.group('suffix') or 0)
+
+            lineages.setdefault(match.group('domain'), []).append(lineage)
+
+        for domain_lineages in lineages.values():
+            domain_lineages.sort(key=lambda lineage: lineage['suffix'])
+
+        return lineages
+
+    def __read(self, path, name):
+        lineage = {'name': name}
+
+        with open(path) as renewal_file:
+            for line in renewal_file:
+                line = line.strip()
+
+                # Only the top level keys point at the lineage, [renewalparams] and later sections are skipped
+                if line.startswith('['):
+                    break
+
+                if '=' not in line or line.startswith('#'):
+                    continue
+
+                key, value = (part.strip() for part in line.split('=', 1))
+
+                if key in LINEAGE_FILES:
+                    lineage[key] = value
+
+        live_dir = f"{self.config_dir}/live/{name}"
+
+        # Paths recorded by certbot are absolute, so they no longer apply once the config directory is moved
+        if 'fullchain' in lineage and os.path.exists(lineage['fullchain']):
+            live_dir = os.path.dirname(lineage['fullchain'])
+
+        lineage['live_dir'] = live_dir
+
+        for key in LINEAGE_FILES:
+            if key not in lineage or not os.path.exists(lineage[key]):
+                lineage[key] = f"{live_dir}/{key}.pem"
+
+        return lineage
@@ -0,0 +1,177 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config_loader import ConfigLoader
+from task import Task
+
+COMPONENTS = ['dtr', 'ucp']
+
+
+class CertPlanner:
+
+    def __init__(self, conf_dirs, workers=4, logger=None):
+        self.conf_dirs = conf_dirs
+        self.workers = workers
+        self.logger = logger
+
+        return
+
+    def plan(self):
+        return self.group(self.requests())
+
+    def requests(self):
+        requests = []
+        for conf_dir in self.conf_dirs:
+            config = ConfigLoader(conf_dir).load()
+
+            for component in COMPONENTS:
+                ssl_certificate = config[component]['ssl_certificate']
+
+                domains = [ssl_certificate['domain_name']]
+                if 'sans' in ssl_certificate and ssl_certificate['sans']:
+                    domains.extend(ssl_certificate['sans'])
+
+                requests.append({'conf_dir': conf_dir,
+                                 'component': component,
+                                 'domain_name': ssl_certificate['domain_name'].lower(),
+                                 'domains': set(domain.lower() for domain in domains)})
+
+        return requests
+
+    def group(self, requests):
+        # The widest requests are placed first, so every narrower request they cover joins them
+        requests = sorted(requests,
+                          key=lambda request: (-len(request['domains']), request['domain_name'], request['conf_dir']))
+
+        certificates = []
+        for request in requests:
+            certificate = next((certificate for certificate in certificates
+                                if request['domains'] <= certificate['domains']), None)
+
+            if certificate is None:
+                certificate = {'cert_name': self.cert_name(request['domain_name'], request['domains']),
+                               'domain_name': request['domain_name'],
+                               'domains': request['domains'],
+                               'issuer': request['conf_dir'],
+                               'targets': []}
+                certificates.append(certificate)
+
+            certificate['targets'].append((request['conf_dir'], request['component']))
+
+        for certificate in certificates:
+            # The primary domain is passed first so that it becomes the certificate subject
+            certificate['domains'] = [certificate['domain_name']] + \
+                sorted(certificate['domains'] - {certificate['domain_name']})
+
+        return certificates
+
+    @staticmethod
+    def cert_name(domain_name, domains):
+        # A certificate name is also its certbot lineage. Deriving it from the domains alone keeps it when clusters
+        # are added or removed, and gives certificates that only overlap names of their own.
+        digest = hashlib.sha256(','.join(sorted(domains)).encode('utf-8')).hexdigest()
+
+        return f"{domain_name}_{digest[:8]}"
+
+    def run(self, certificates=None):
+        if certificates is None:
+            certificates = self.plan()
+
+        targets = sum(len(certificate['targets']) for certificate in certificates)
+
+        self.logger.info(f"Issuing {len(certificates)} certificate(s) for {targets} UCP and DTR endpoint(s) "
+                         f"across {len(self.conf_dirs)} cluster(s)")
+
+        start = time.monotonic()
+
+        tasks = {}
+        for conf_dir in self.conf_dirs:
+            tasks[conf_dir] = Task('certs', conf_dir)
+            tasks[conf_dir].load()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as issue_pool, \
+                ThreadPoolExecutor(max_workers=self.workers) as apply_pool:
+            # Each certificate fans out to its clusters as soon as it is issued, without waiting for the others
+            issue_futures = [issue_pool.submit(self.issue, tasks, certificate, apply_pool)
+                             for certificate in certificates]
+
+            results = []
+            for future in issue_futures:
+                results.extend(apply_future.result() for apply_future in future.result())
+
+        self.summarize(results, time.monotonic() - start)
+
+        return results
+
+    def issue(self, tasks, certificate, apply_pool):
+        issuer = tasks[certificate['issuer']].module
+
+        try:
+            # A current certificate that one of the clusters already has becomes the shared lineage, instead of
+            # ordering it again on the first fleet run
+            seed_directories = [tasks[conf_dir].module.find_cert_directory(component)
+                                for conf_dir, component in certificate['targets']]
+
+            issued = issuer.generate_shared_certs(certificate['cert_name'], certificate['domains'],
+                                                  seed_directories=seed_directories)
+            cert_directory = issuer.find_cert_directory(issuer.shared_component(certificate['cert_name']),
+                                                        certificate['cert_name'])
+
+            if cert_directory is None:
+                raise Exception(f"No certificate found for {certificate['cert_name']}")
+
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+            return [apply_pool.submit(self.failed, certificate, conf_dir, component, error)
+                    for conf_dir, component in certificate['targets']]
+
+        return [apply_pool.submit(self.apply, tasks[conf_dir].module, certificate, conf_dir, component, issued,
+                                  cert_directory)
+                for conf_dir, component in certificate['targets']]
+
+    def apply(self, module, certificate, conf_dir, component, issued, cert_directory):
+        start = time.monotonic()
+
+        try:
+            # Without a new certificate, only clusters that are not known to serve it already are updated
+            if issued or module.config['certbot']['always_apply_certs'][component] or \
+                    module.config['certbot'].get('probe_served_certs', True):
+                applied = getattr(module, f"apply_{component}_certs")(cert_directory=cert_directory) is not None
+            else:
+                applied = False
+
+            return {'conf_dir': conf_dir,
+                    'component': component,
+                    'cert_name': certificate['cert_name'],
+                    'status': 'success',
+                    'result': 'applied' if applied else 'unchanged',
+                    'duration': time.monotonic() - start}
+
+        except Exception as e:
+            return self.failed(certificate, conf_dir, component, f"{type(e).__name__}: {e}", start)
+
+    def failed(self, certificate, conf_dir, component, error, start=None):
+        return {'conf_dir': conf_dir,
+                'component': component,
+                'cert_name': certificate['cert_name'],
+                'status': 'failure',
+                'error': error,
+                'duration': time.monotonic() - start if start is not None else 0.0}
+
+    def summarize(self, results, duration):
+        for result in results:
+            if result['status'] == 'success':
+                self.logger.info(f"[{result['conf_dir']}] {result['component'].upper()} {result['cert_name']} "
+                                 f"{result['result']} in {result['duration']:.2f}s")
+            else:
+                self.logger.error(f"[{result['conf_dir']}] {result['component'].upper()} {result['cert_name']} "
+                                  f"failure - {result['error']}")
+
+        succeeded = len([result for result in results if result['status'] == 'success'])
+
+        self.logger.info(f"Fleet certificates complete: {succeeded} succeeded, {len(results) - succeeded} failed, "
+                         f"total {duration:.2f}s")
+
+        return
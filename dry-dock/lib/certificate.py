@@ -0,0 +1,43 @@
+import datetime
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.x509.oid import NameOID
+
+
+class Certificate:
+
+    def __init__(self, file):
+        self.file = file
+
+        with open(file, 'rb') as pem:
+            # The leaf certificate is the first entry of a fullchain.pem
+            self.certificate = x509.load_pem_x509_certificate(pem.read(), default_backend())
+
+        if hasattr(self.certificate, 'not_valid_after_utc'):
+            self.not_after = self.certificate.not_valid_after_utc
+        else:
+            self.not_after = self.certificate.not_valid_after.replace(tzinfo=datetime.timezone.utc)
+
+        self.domains = self.__domains()
+
+        return
+
+    def expires_within(self, days):
+        remaining = self.not_after - datetime.datetime.now(datetime.timezone.utc)
+
+        return remaining <= datetime.timedelta(days=days)
+
+    def matches(self, domains):
+        return self.domains == set(domain.lower() for domain in domains)
+
+    def __domains(self):
+        try:
+            extension = self.certificate.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+            domains = extension.value.get_values_for_type(x509.DNSName)
+
+        except x509.ExtensionNotFound:
+            domains = [attribute.value for attribute in
+                       self.certificate.subject.get_attributes_for_oid(NameOID.COMMON_NAME)]
+
+        return set(domain.lower() for domain in domains)
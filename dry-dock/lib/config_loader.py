@@ -1,13 +1,18 @@
+import collections.abc
 import os
+import threading
 
 from exception.unsupported_config_error import UnsupportedConfigError
+from secret_resolver import SecretReference, SecretResolver
 
 
 class ConfigLoader:
     __path = os.path.dirname(os.path.realpath(__file__))
 
-    def __init__(self, conf_dir, configs=None):
+    def __init__(self, conf_dir, configs=None, cache_dir=None, secret_resolver=None):
         self.conf_dir = conf_dir
+        self.cache_dir = cache_dir if cache_dir is not None else os.environ.get('DRY_DOCK_CONFIG_CACHE_DIR')
+        self.secret_resolver = secret_resolver if secret_resolver is not None else SecretResolver.shared()
 
         self.__config_map = {
             'auth': f"{self.__path}/../conf/{self.conf_dir}/auth.yml",
@@ -28,20 +33,101 @@ class ConfigLoader:
         return
 
     def load(self):
-        all_configs = {}
-
         for config in self.configs:
-            try:
-                file = self.__config_map[config]
+            if config not in self.__config_map:
+                raise UnsupportedConfigError(config)
+
+        return LazyConfig(self)
+
+    def config_file(self, config):
+        try:
+            return self.__config_map[config]
+
+        except KeyError as e:
+            raise UnsupportedConfigError(e)
+
+    def load_config(self, config):
+        file = self.config_file(config)
+
+        filename, file_type = os.path.splitext(file)
+        file_type = file_type.lower()
+
+        if file_type in ['.yml', '.yaml']:
+            from config_loaders.yaml import Yaml
+            return Yaml(file, cache_dir=self.cache_dir).load()
+
+        return None
+
+
+class LazyConfig(collections.abc.Mapping):
+
+    def __init__(self, config_loader):
+        self.config_loader = config_loader
+
+        self.__configs = {}
+        self.__lock = threading.Lock()
+
+        return
+
+    def __getitem__(self, config):
+        if config not in self.config_loader.configs:
+            raise KeyError(config)
+
+        with self.__lock:
+            if config not in self.__configs:
+                self.__configs[config] = resolve_value(self.config_loader.load_config(config),
+                                                       self.config_loader.secret_resolver)
+
+            return self.__configs[config]
+
+    def __iter__(self):
+        return iter(self.config_loader.configs)
+
+    def __len__(self):
+        return len(self.config_loader.configs)
+
+    def __repr__(self):
+        return f"LazyConfig(conf_dir={self.config_loader.conf_dir!r}, loaded={sorted(self.__configs)!r})"
+
+
+class ConfigSection(collections.abc.Mapping):
+
+    def __init__(self, data, secret_resolver):
+        self.data = data
+        self.secret_resolver = secret_resolver
+
+        return
+
+    def __getitem__(self, key):
+        return resolve_value(self.data[key], self.secret_resolver)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return repr(self.data)
+
+
+def resolve_value(value, secret_resolver):
+    if isinstance(value, SecretReference):
+        return secret_resolver.resolve(value)
+    elif isinstance(value, dict):
+        return ConfigSection(value, secret_resolver)
+    elif isinstance(value, list):
+        return [resolve_plain(entry, secret_resolver) for entry in value]
 
-            except KeyError as e:
-                raise UnsupportedConfigError(e)
+    return value
 
-            filename, file_type = os.path.splitext(file)
-            file_type = file_type.lower()
 
-            if file_type in ['.yml', '.yaml']:
-                from config_loaders.yaml import Yaml
-                all_configs[config] = Yaml(file).load()
+def resolve_plain(value, secret_resolver):
+    if isinstance(value, SecretReference):
+        return secret_resolver.resolve(value)
+    elif isinstance(value, dict):
+        return {key: resolve_plain(entry, secret_resolver) for key, entry in value.items()}
+    elif isinstance(value, list):
+        return [resolve_plain(entry, secret_resolver) for entry in value]
 
-        return all_configs
+    return value
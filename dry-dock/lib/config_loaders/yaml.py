@@ -1,33 +1,171 @@
-import yaml
+import hashlib
+import json
+import os
+import stat
+import threading
 
 from os import environ
 from re import compile
 from string import Template
 
+from secret_resolver import SecretReference
+
+try:
+    from yaml import CLoader as BaseLoader
+except ImportError:
+    from yaml import Loader as BaseLoader
+
 secret_pattern = compile(r'^<%= SECRET\((.*)\) %>(.*)$')
-yaml.add_implicit_resolver("!secret_loader", secret_pattern)
+
+
+class Loader(BaseLoader):
+    pass
 
 
 def secret_loader(loader, node):
     entry = loader.construct_scalar(node)
-    secret_file = entry[entry.find("(") + 1:entry.find(")")]
-
-    secret = open(secret_file).read()
+    reference = secret_pattern.match(entry).group(1).strip()
 
-    return secret.strip()
+    # Secrets are resolved when the configuration value is used, never while parsing
+    return SecretReference(reference)
 
 
-yaml.add_constructor('!secret_loader', secret_loader)
+Loader.add_implicit_resolver("!secret_loader", secret_pattern, None)
+Loader.add_constructor('!secret_loader', secret_loader)
 
 
 class Yaml:
-    def __init__(self, file):
+    # Keyed by path, so a changed file replaces its previous entry instead of adding one in long-running processes
+    __cache = {}
+    __cache_lock = threading.Lock()
+
+    def __init__(self, file, cache_dir=None):
         self.file = file
+        self.cache_dir = cache_dir
 
         return
 
     def load(self):
-        config_template = Template(open(self.file).read())
+        path = os.path.realpath(self.file)
+        mtime = os.stat(path).st_mtime_ns
+
+        config_template = Template(open(path).read())
         config = config_template.substitute(environ)
 
-        return yaml.load(config)
+        # The rendered text is part of the key because environment variables are substituted before parsing
+        key = hashlib.sha256(f"{path}\0{mtime}\0{config}".encode('utf-8')).hexdigest()
+
+        with self.__cache_lock:
+            cached_key, cached_data = self.__cache.get(path, (None, None))
+
+            if cached_key == key:
+                return cached_data
+
+        data = self.__read_cache(key)
+
+        if data is None:
+            loader = Loader(config)
+
+            try:
+                data = loader.get_single_data()
+
+            finally:
+                loader.dispose()
+
+            self.__write_cache(key, data)
+
+        with self.__cache_lock:
+            self.__cache[path] = (key, data)
+
+        if cached_key is not None:
+            self.__remove_cache(cached_key)
+
+        return data
+
+    def __read_cache(self, key):
+        if not self.__cache_dir_is_private():
+            return None
+
+        try:
+            descriptor = os.open(os.path.join(self.cache_dir, f"{key}.json"), os.O_RDONLY)
+
+        except OSError:
+            return None
+
+        with os.fdopen(descriptor) as file:
+            # Cached values include endpoints and secret references, so only files no other user can write are used
+            if not self.__is_private(os.fstat(descriptor)):
+                return None
+
+            try:
+                return json.load(file, object_hook=decode_secret)
+
+            except ValueError:
+                return None
+
+    def __write_cache(self, key, data):
+        if not self.cache_dir:
+            return
+
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+
+        if not self.__cache_dir_is_private():
+            return
+
+        try:
+            content = json.dumps(data, default=encode_secret)
+
+        except (TypeError, ValueError):
+            # Values without a JSON form, such as YAML timestamps, are only cached in memory
+            return
+
+        cache_file = os.path.join(self.cache_dir, f"{key}.json")
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+
+        descriptor = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(content)
+
+        os.replace(temp_file, cache_file)
+
+        return
+
+    def __remove_cache(self, key):
+        if not self.cache_dir:
+            return
+
+        try:
+            os.remove(os.path.join(self.cache_dir, f"{key}.json"))
+
+        except OSError:
+            pass
+
+        return
+
+    def __cache_dir_is_private(self):
+        if not self.cache_dir:
+            return False
+
+        try:
+            return self.__is_private(os.stat(self.cache_dir))
+
+        except OSError:
+            return False
+
+    @staticmethod
+    def __is_private(status):
+        return status.st_uid == os.getuid() and not status.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+
+
+def decode_secret(value):
+    if set(value.keys()) == {'__secret__'}:
+        return SecretReference(value['__secret__'])
+
+    return value
+
+
+def encode_secret(value):
+    if isinstance(value, SecretReference):
+        return {'__secret__': value.reference}
+
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
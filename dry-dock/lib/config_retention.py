@@ -0,0 +1,127 @@
+import collections.abc
+from concurrent.futures import ThreadPoolExecutor
+
+from exception.unsupported_config_error import UnsupportedConfigError
+from http_session import HttpSession
+from versioned_config import config_number
+
+
+class ConfigRetention:
+    DEFAULT_KEEP = 10
+    DEFAULT_WORKERS = 4
+    DEFAULT_PREFIXES = ['com.docker.ucp.config', 'com.docker.ucp.interlock.conf']
+
+    def __init__(self, ucp_api, keep=DEFAULT_KEEP, prefixes=None, workers=DEFAULT_WORKERS, dry_run=False,
+                 logger=None):
+        # The latest config is about to be, or already is, used by ucp-agent and must never be deleted
+        if keep < 1:
+            raise UnsupportedConfigError(f"config_retention keep must be at least 1: {keep}")
+
+        self.ucp_api = ucp_api
+        self.keep = keep
+        self.prefixes = prefixes or self.DEFAULT_PREFIXES
+        self.workers = workers
+        self.dry_run = dry_run
+        self.logger = logger
+
+        return
+
+    def referenced_config_ids(self):
+        services = self.ucp_api.iter_services(fields=['Spec.TaskTemplate.ContainerSpec.Configs'])
+
+        referenced = set()
+        for service in services:
+            configs = service.get('Spec', {}).get('TaskTemplate', {}).get('ContainerSpec', {}).get('Configs') or []
+
+            referenced.update(entry['ConfigID'] for entry in configs)
+
+        return referenced
+
+    def plan(self, prefix, referenced):
+        configs = self.ucp_api.iter_configs(f'{{"name":["{prefix}"]}}', fields=['ID', 'Spec.Name'])
+
+        # Only configs named exactly <prefix>-<number> are considered, anything else is never deleted
+        numbered = sorted(((config_number(config['Spec']['Name'], prefix), config) for config in configs
+                           if config_number(config['Spec']['Name'], prefix) is not None),
+                          key=lambda entry: entry[0],
+                          reverse=True)
+
+        keep = [config for number, config in numbered[:self.keep]]
+        keep.extend(config for number, config in numbered[self.keep:] if config['ID'] in referenced)
+
+        kept_ids = set(config['ID'] for config in keep)
+        delete = [config for number, config in numbered if config['ID'] not in kept_ids]
+
+        return keep, delete
+
+    def run(self):
+        referenced = self.referenced_config_ids()
+
+        results = {}
+        for prefix in self.prefixes:
+            keep, delete = self.plan(prefix, referenced)
+
+            self.logger.info("%s: keeping %s config(s), %s %s unreferenced config(s)", prefix, len(keep),
+                             'would delete' if self.dry_run else 'deleting', len(delete))
+
+            if self.dry_run:
+                for config in delete:
+                    self.logger.info("Would delete %s (%s)", config['Spec']['Name'], config['ID'])
+
+                results[prefix] = {'kept': len(keep),
+                                   'deleted': [config['Spec']['Name'] for config in delete],
+                                   'failed': []}
+                continue
+
+            deleted, failed = self.delete(delete)
+
+            results[prefix] = {'kept': len(keep),
+                               'deleted': deleted,
+                               'failed': failed}
+
+        return results
+
+    def delete(self, configs):
+        deleted = []
+        failed = []
+
+        if not configs:
+            return deleted, failed
+
+        # Swarm has no bulk delete, so deletes share the pooled connections with a bounded number in flight
+        HttpSession.reserve(self.workers)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [(config, pool.submit(self.ucp_api.delete_config, config['ID'])) for config in configs]
+
+            for config, future in futures:
+                try:
+                    future.result()
+                    deleted.append(config['Spec']['Name'])
+
+                except Exception as e:
+                    # A config can become referenced after the plan was made, it is kept and retried next time
+                    failed.append(config['Spec']['Name'])
+
+                    self.logger.warning("Unable to delete %s: %s", config['Spec']['Name'], e)
+
+        return deleted, failed
+
+    @staticmethod
+    def from_config(settings, ucp_api, logger=None):
+        config_retention = settings.get('config_retention')
+
+        # Deleting configs is opt-in, nothing is pruned unless config_retention is set
+        if not config_retention:
+            return None
+        elif not isinstance(config_retention, collections.abc.Mapping):
+            config_retention = {}
+        elif not config_retention.get('enabled', True):
+            return None
+
+        return ConfigRetention(ucp_api,
+                               keep=config_retention.get('keep', ConfigRetention.DEFAULT_KEEP),
+                               prefixes=config_retention.get('prefixes'),
+                               workers=config_retention.get('workers', ConfigRetention.DEFAULT_WORKERS),
+                               dry_run=config_retention.get('dry_run', False),
+                               logger=logger)
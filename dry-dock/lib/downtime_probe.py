@@ -0,0 +1,103 @@
+import socket
+import threading
+import time
+
+
+class DowntimeProbe:
+    DEFAULT_INTERVAL = 0.1
+    DEFAULT_TIMEOUT = 1.0
+
+    def __init__(self, targets, interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT):
+        self.targets = targets
+        self.interval = interval
+        self.timeout = timeout
+
+        self.probes = 0
+        self.failures = 0
+        self.outages = []
+
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__outage_start = None
+
+        return
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+        return False
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+        return
+
+    def stop(self):
+        self.__stop_event.set()
+        self.__thread.join()
+
+        with self.__lock:
+            if self.__outage_start is not None:
+                self.outages.append(time.monotonic() - self.__outage_start)
+                self.__outage_start = None
+
+        return
+
+    def serving(self, targets=None):
+        # Routing is up as long as the proxy accepts connections on any of the targets
+        for host, port in targets or self.targets:
+            try:
+                with socket.create_connection((host, port), timeout=self.timeout):
+                    return True
+
+            except OSError:
+                continue
+
+        return False
+
+    def wait_until_serving(self, targets, timeout):
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            if all(self.serving([target]) for target in targets):
+                return True
+
+            time.sleep(self.interval)
+
+        return False
+
+    def report(self):
+        with self.__lock:
+            return {'probes': self.probes,
+                    'failures': self.failures,
+                    'outages': len(self.outages),
+                    'longest_outage': max(self.outages, default=0.0),
+                    'downtime': sum(self.outages)}
+
+    def __run(self):
+        while not self.__stop_event.is_set():
+            start = time.monotonic()
+            serving = self.serving()
+
+            with self.__lock:
+                self.probes += 1
+
+                if not serving:
+                    self.failures += 1
+
+                    if self.__outage_start is None:
+                        self.__outage_start = start
+                elif self.__outage_start is not None:
+                    self.outages.append(start - self.__outage_start)
+                    self.__outage_start = None
+
+            self.__stop_event.wait(max(self.interval - (time.monotonic() - start), 0))
+
+        return
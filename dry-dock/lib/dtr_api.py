@@ -1,16 +1,22 @@
-import requests
+import time
+
+from http_session import HttpSession
 
 
 class DtrApi:
 
-    def __init__(self, endpoint, username, password, use_ssl=True, verify_ssl=True, logger=None):
+    def __init__(self, endpoint, username, password, use_ssl=True, verify_ssl=True, logger=None,
+                 session=None, token_cache=None, metrics=None):
         self.endpoint = endpoint
         self.username = username
         self.password = password
         self.verify_ssl = verify_ssl
         self.logger = logger
+        self.session = session if session is not None else HttpSession.shared()
+        self.token_cache = token_cache
+        self.metrics = metrics
 
-        self.uri = f"https://{endpoint}" if use_ssl else f"https://{endpoint}"
+        self.uri = f"https://{endpoint}" if use_ssl else f"http://{endpoint}"
 
         self.__token = None
         self.__hashed_token = None
@@ -20,7 +26,7 @@ class DtrApi:
     def update_certs(self, body):
         url = f"{self.uri}/api/v0/meta/settings"
 
-        response = self.__post_request(url=url, body=body)
+        response = self.__post_request(url=url, endpoint='/api/v0/meta/settings', body=body)
 
         if response.status_code != 202:
             raise Exception(f"Failed to update certs - {response.status_code}")
@@ -31,13 +37,30 @@ class DtrApi:
         if self.__token is not None:
             return
 
+        if self.token_cache is not None:
+            cached = self.token_cache.get(self.uri, self.username, include_expired=True)
+
+            if cached is not None:
+                if not self.token_cache.expired(cached):
+                    self.__token = cached['token']
+                    self.__hashed_token = cached['hashed_token']
+
+                    if self.__is_authenticated():
+                        return True
+
+                    self.__token = None
+                    self.__hashed_token = None
+
+                # DTR API tokens never expire on their own, so a cached token is revoked once it is replaced
+                self.__revoke_token(cached['hashed_token'])
+                self.token_cache.delete(self.uri, self.username)
+
         url = f"{self.uri}/api/v0/api_tokens"
         body = {"tokenLabel": token_label}
 
-        response = requests.post(url=url,
-                                 auth=requests.auth.HTTPBasicAuth(self.username, self.password),
-                                 json=body,
-                                 verify=self.verify_ssl)
+        response = self.__request('POST', url=url, endpoint='/api/v0/api_tokens',
+                                  auth=(self.username, self.password),
+                                  json=body)
 
         if response.status_code != 200:
             raise Exception(f"Failed to create DTR token for {self.endpoint} - {response.status_code}")
@@ -48,15 +71,24 @@ class DtrApi:
         else:
             raise Exception("Failed to extract DTR token")
 
+        if self.token_cache is not None:
+            self.token_cache.put(self.uri, self.username, token=self.__token, hashed_token=self.__hashed_token)
+
         return True
 
     def delete_token(self):
         if self.__token is None:
             return
 
+        # A cached token is left valid on the server so that the next run can reuse it
+        if self.token_cache is not None:
+            self.__token = None
+            self.__hashed_token = None
+            return True
+
         url = f"{self.uri}/api/v0/api_tokens/{self.__hashed_token}"
 
-        response = self.__delete_request(url=url)
+        response = self.__delete_request(url=url, endpoint='/api/v0/api_tokens/{id}')
 
         if response.status_code != 200:
             raise Exception(f"Failed to delete DTR token for {self.endpoint} - {response.status_code}")
@@ -66,30 +98,46 @@ class DtrApi:
 
         return True
 
-    def __delete_request(self, url):
-        return requests.delete(url=url,
-                               auth=self.__get_auth(),
-                               verify=self.verify_ssl)
+    def __delete_request(self, url, endpoint):
+        return self.__request('DELETE', url=url, endpoint=endpoint, auth=self.__get_auth())
+
+    def __get_request(self, url, endpoint, params=None):
+        return self.__request('GET', url=url, endpoint=endpoint, auth=self.__get_auth(), params=params)
+
+    def __post_request(self, url, endpoint, body=None):
+        return self.__request('POST', url=url, endpoint=endpoint, auth=self.__get_auth(), json=body)
+
+    def __request(self, method, url, endpoint, **kwargs):
+        start = time.monotonic()
+
+        response = self.session.request(method, url=url, verify=self.verify_ssl, **kwargs)
+
+        if self.metrics is not None:
+            self.metrics.record_request(method, endpoint, response.status_code, time.monotonic() - start,
+                                        len(response.request.body or b''), len(response.content))
+
+        return response
+
+    def __revoke_token(self, hashed_token):
+        url = f"{self.uri}/api/v0/api_tokens/{hashed_token}"
+
+        # The token itself may no longer be accepted, so it is revoked with the account credentials
+        response = self.__request('DELETE', url=url, endpoint='/api/v0/api_tokens/{id}',
+                                  auth=(self.username, self.password))
 
-    def __get_request(self, url, params=None):
-        return requests.get(url=url,
-                            auth=self.__get_auth(),
-                            params=params,
-                            verify=self.verify_ssl)
+        if response.status_code not in [200, 204, 404] and self.logger is not None:
+            self.logger.warning("Failed to revoke the replaced DTR token for %s - %s", self.endpoint,
+                                response.status_code)
 
-    def __post_request(self, url, body=None):
-        return requests.post(url=url,
-                             auth=self.__get_auth(),
-                             json=body,
-                             verify=self.verify_ssl)
+        return response.status_code in [200, 204, 404]
 
     def __get_auth(self):
-        return requests.auth.HTTPBasicAuth(self.username, self.__token)
+        return self.username, self.__token
 
     def __is_authenticated(self):
         url = f"{self.uri}/api/v0/api_tokens/{self.__hashed_token}"
 
-        response = self.__get_request(url=url)
+        response = self.__get_request(url=url, endpoint='/api/v0/api_tokens/{id}')
 
         if response.status_code != 200:
             return False
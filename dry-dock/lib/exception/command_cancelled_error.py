@@ -0,0 +1,2 @@
+class CommandCancelledError(Exception):
+    pass
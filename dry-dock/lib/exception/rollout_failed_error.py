@@ -0,0 +1,2 @@
+class RolloutFailedError(Exception):
+    pass
@@ -0,0 +1,2 @@
+class RolloutTimeoutError(Exception):
+    pass
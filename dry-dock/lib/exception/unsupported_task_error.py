@@ -0,0 +1,2 @@
+class UnsupportedTaskError(Exception):
+    pass
@@ -1,12 +1,23 @@
+import collections
 import os
 import subprocess
+import threading
+import time
+
+from exception.command_cancelled_error import CommandCancelledError
+from exception.command_timeout_error import CommandTimeoutError
 
 
 class ExecuteCommand:
+    POLL_INTERVAL = 0.1
 
-    def __init__(self, command, environment=None):
+    def __init__(self, command, environment=None, logger=None, timeout=None, max_lines=None, cancel_event=None):
         self.command = command
         self.environment = environment
+        self.logger = logger
+        self.timeout = timeout
+        self.max_lines = max_lines
+        self.cancel_event = cancel_event
 
         params = {'stderr': subprocess.PIPE,
                   'stdout': subprocess.PIPE}
@@ -17,8 +28,56 @@ class ExecuteCommand:
 
             params['env'] = self.environment
 
-        self.result = subprocess.run(self.command, **params)
-        self.result.stderr = self.result.stderr.decode("utf-8").splitlines()
-        self.result.stdout = self.result.stdout.decode("utf-8").splitlines()
+        self.result = self.__run(params)
+
+        return
+
+    def __run(self, params):
+        # Only the last max_lines lines of each stream are kept, everything is forwarded to the logger as it arrives
+        stdout = collections.deque(maxlen=self.max_lines)
+        stderr = collections.deque(maxlen=self.max_lines)
+
+        process = subprocess.Popen(self.command, **params)
+
+        readers = [threading.Thread(target=self.__forward, args=(process.stdout, stdout, 'stdout'), daemon=True),
+                   threading.Thread(target=self.__forward, args=(process.stderr, stderr, 'stderr'), daemon=True)]
+
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+
+        try:
+            while process.poll() is None:
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    raise CommandCancelledError(f"{self.command[0]} was cancelled")
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise CommandTimeoutError(f"{self.command[0]} did not finish within {self.timeout} seconds")
+
+                try:
+                    process.wait(timeout=self.POLL_INTERVAL)
+
+                except subprocess.TimeoutExpired:
+                    pass
+
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+            for reader in readers:
+                reader.join()
+
+        return subprocess.CompletedProcess(self.command, process.returncode, list(stdout), list(stderr))
+
+    def __forward(self, pipe, lines, stream):
+        with pipe:
+            for raw_line in iter(pipe.readline, b''):
+                line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+                lines.append(line)
+
+                if self.logger is not None:
+                    self.logger.debug("%s %s: %s", os.path.basename(self.command[0]), stream, line)
 
         return
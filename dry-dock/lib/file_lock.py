@@ -0,0 +1,41 @@
+import fcntl
+import os
+
+
+class FileLock:
+
+    def __init__(self, path, blocking=True):
+        self.path = path
+        self.blocking = blocking
+        self.descriptor = None
+
+        return
+
+    def acquire(self):
+        self.descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        # Without blocking, flock raises BlockingIOError while another process holds the lock
+        try:
+            fcntl.flock(self.descriptor, fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        except OSError:
+            os.close(self.descriptor)
+            self.descriptor = None
+            raise
+
+        return self
+
+    def release(self):
+        fcntl.flock(self.descriptor, fcntl.LOCK_UN)
+        os.close(self.descriptor)
+        self.descriptor = None
+
+        return
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+        return False
@@ -0,0 +1,88 @@
+import os
+import time
+
+from file_watchers.polling import Polling
+
+
+class FileWatcher:
+    DEFAULT_SETTLE = 0.5
+
+    def __init__(self, settle=DEFAULT_SETTLE, poll_interval=Polling.DEFAULT_INTERVAL, logger=None):
+        self.settle = settle
+        self.logger = logger
+
+        try:
+            from file_watchers.inotify import Inotify
+            self.backend = Inotify()
+
+        except (AttributeError, OSError, TypeError) as e:
+            # No inotify outside of Linux or when the instance limit is reached, fall back to comparing snapshots
+            if self.logger is not None:
+                self.logger.warning("inotify is unavailable, polling every %ss instead: %s", poll_interval, e)
+
+            self.backend = Polling(interval=poll_interval)
+
+        self.__roots = {}
+
+        return
+
+    def watch(self, directory, recursive=False):
+        directory = os.path.realpath(directory)
+
+        self.__roots[directory] = recursive
+        self.__add(directory, recursive)
+
+        return
+
+    def changes(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        changed = set()
+        while True:
+            # Watches on directories that did not exist yet or were removed are retried on every pass
+            for directory, recursive in self.__roots.items():
+                if not self.backend.watching(directory):
+                    if self.__add(directory, recursive):
+                        changed.add(directory)
+
+            if changed:
+                wait = self.settle
+            elif deadline is None:
+                wait = None
+            else:
+                wait = max(deadline - time.monotonic(), 0)
+
+            paths = self.backend.read(wait)
+
+            for path in paths:
+                self.__track(path)
+
+            changed.update(paths)
+
+            # Editors and certbot write in bursts, so return once the directory has been quiet for settle seconds
+            if not paths and (changed or wait is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        self.backend.close()
+
+        return
+
+    def __add(self, directory, recursive):
+        if not self.backend.add(directory):
+            return False
+
+        if recursive:
+            for parent, directories, files in os.walk(directory):
+                for name in directories:
+                    self.backend.add(os.path.join(parent, name))
+
+        return True
+
+    def __track(self, path):
+        for directory, recursive in self.__roots.items():
+            if recursive and path.startswith(f"{directory}{os.sep}") and os.path.isdir(path) and \
+                    not os.path.islink(path) and not self.backend.watching(path):
+                self.__add(path, recursive)
+
+        return
@@ -0,0 +1,91 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+
+class Inotify:
+    __event = struct.Struct('iIII')
+
+    WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+        IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    def __init__(self):
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        self.descriptor = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self.descriptor < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.__watches = {}
+
+        return
+
+    def add(self, directory):
+        watch = self.__libc.inotify_add_watch(self.descriptor, os.fsencode(directory), self.WATCH_MASK)
+
+        if watch < 0:
+            return False
+
+        self.__watches[watch] = directory
+
+        return True
+
+    def watching(self, directory):
+        return directory in self.__watches.values()
+
+    def read(self, timeout):
+        readable, _, _ = select.select([self.descriptor], [], [], timeout)
+
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.descriptor, 65536)
+
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(data):
+            watch, mask, cookie, length = self.__event.unpack_from(data, offset)
+            name = data[offset + self.__event.size:offset + self.__event.size + length].rstrip(b'\0')
+            offset += self.__event.size + length
+
+            # Events were dropped, so every watched directory has to be treated as changed
+            if mask & IN_Q_OVERFLOW:
+                changed.extend(self.__watches.values())
+                continue
+
+            directory = self.__watches.get(watch)
+
+            if directory is None:
+                continue
+
+            if mask & IN_IGNORED:
+                del self.__watches[watch]
+
+            changed.append(os.path.join(directory, os.fsdecode(name)) if name else directory)
+
+        return changed
+
+    def close(self):
+        os.close(self.descriptor)
+
+        return
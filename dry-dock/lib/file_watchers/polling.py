@@ -0,0 +1,82 @@
+import os
+import time
+
+
+class Polling:
+    DEFAULT_INTERVAL = 2.0
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+
+        self.__snapshots = {}
+
+        return
+
+    def add(self, directory):
+        snapshot = self.__snapshot(directory)
+
+        if snapshot is None:
+            return False
+
+        self.__snapshots[directory] = snapshot
+
+        return True
+
+    def watching(self, directory):
+        return directory in self.__snapshots
+
+    def read(self, timeout):
+        deadline = time.monotonic() + (timeout if timeout is not None else float('inf'))
+
+        while True:
+            changed = self.__compare()
+
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+            time.sleep(max(min(self.interval, deadline - time.monotonic()), 0))
+
+    def close(self):
+        self.__snapshots.clear()
+
+        return
+
+    def __compare(self):
+        changed = []
+
+        for directory, previous in list(self.__snapshots.items()):
+            current = self.__snapshot(directory)
+
+            if current is None:
+                del self.__snapshots[directory]
+                changed.append(directory)
+                continue
+
+            for name in set(previous) | set(current):
+                if previous.get(name) != current.get(name):
+                    changed.append(os.path.join(directory, name))
+
+            self.__snapshots[directory] = current
+
+        return changed
+
+    def __snapshot(self, directory):
+        try:
+            entries = list(os.scandir(directory))
+
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+        snapshot = {}
+        for entry in entries:
+            try:
+                stat = entry.stat(follow_symlinks=False)
+
+            except FileNotFoundError:
+                continue
+
+            # Certbot renewals only repoint the symlinks under live/, so the link target is part of the state
+            target = os.readlink(entry.path) if entry.is_symlink() else None
+            snapshot[entry.name] = (stat.st_ino, stat.st_size, stat.st_mtime_ns, target)
+
+        return snapshot
@@ -0,0 +1,93 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from http_session import HttpSession
+from task import Task
+
+
+def run_task(task_name, conf_dir):
+    start = time.monotonic()
+
+    try:
+        result = Task(task_name, conf_dir).run()
+
+        if not isinstance(result, (bool, dict, float, int, list, str, type(None))):
+            result = str(result)
+
+        return {'conf_dir': conf_dir,
+                'status': 'success',
+                'result': result,
+                'duration': time.monotonic() - start}
+
+    except Exception as e:
+        return {'conf_dir': conf_dir,
+                'status': 'failure',
+                'error': f"{type(e).__name__}: {e}",
+                'duration': time.monotonic() - start}
+
+
+class Fleet:
+    __path = os.path.dirname(os.path.realpath(__file__))
+
+    def __init__(self, task_name, conf_dirs, workers=4, executor='process', logger=None):
+        self.task_name = task_name
+        self.conf_dirs = self.expand_conf_dirs(conf_dirs)
+        self.workers = workers
+        self.executor = executor
+        self.logger = logger
+
+        return
+
+    def expand_conf_dirs(self, patterns):
+        conf_root = os.path.realpath(f"{self.__path}/../conf")
+
+        conf_dirs = []
+        for pattern in patterns:
+            matches = sorted(glob.glob(os.path.join(conf_root, pattern)))
+
+            for match in matches:
+                conf_dir = os.path.relpath(match, conf_root)
+
+                if os.path.isdir(match) and conf_dir not in conf_dirs:
+                    conf_dirs.append(conf_dir)
+
+        return conf_dirs
+
+    def run(self):
+        pool_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+
+        self.logger.info(f"Running {self.task_name} on {len(self.conf_dirs)} cluster(s) "
+                         f"with {self.workers} {self.executor} worker(s)")
+
+        # Thread workers share one connection pool, process workers each have their own
+        if self.executor != 'process':
+            HttpSession.reserve(self.workers)
+
+        start = time.monotonic()
+
+        with pool_class(max_workers=self.workers) as pool:
+            futures = [pool.submit(run_task, self.task_name, conf_dir) for conf_dir in self.conf_dirs]
+            results = [future.result() for future in futures]
+
+        self.summarize(results, time.monotonic() - start)
+
+        return results
+
+    def summarize(self, results, duration):
+        for result in results:
+            if result['status'] == 'success':
+                outcome = f" ({result['result']})" if result['result'] is not None else ''
+
+                self.logger.info(f"[{result['conf_dir']}] success in {result['duration']:.2f}s{outcome}")
+            else:
+                self.logger.error(f"[{result['conf_dir']}] failure in {result['duration']:.2f}s - {result['error']}")
+
+        succeeded = len([result for result in results if result['status'] == 'success'])
+        durations = [result['duration'] for result in results]
+
+        self.logger.info(f"Fleet {self.task_name} complete: {succeeded} succeeded, {len(results) - succeeded} failed, "
+                         f"slowest {max(durations, default=0):.2f}s, total {duration:.2f}s")
+
+        return
@@ -0,0 +1,69 @@
+import threading
+
+
+class HttpSession:
+    __lock = threading.Lock()
+    __shared = None
+
+    DEFAULT_POOL_CONNECTIONS = 10
+    DEFAULT_POOL_MAXSIZE = 10
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 max_retries=0, pool_block=False):
+        # requests is only imported once a session is needed, so short-lived runs that never call an API start faster
+        import requests
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.pool_block = pool_block
+
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        self.__mount()
+
+        return
+
+    def close(self):
+        self.session.close()
+
+        return
+
+    def resize(self, pool_maxsize):
+        # Connections beyond pool_maxsize to one host are closed after each request instead of reused, so callers
+        # that run more requests concurrently grow the pool to their worker count first
+        if pool_maxsize > self.pool_maxsize:
+            self.pool_maxsize = pool_maxsize
+            self.__mount()
+
+        return
+
+    @staticmethod
+    def shared(pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        with HttpSession.__lock:
+            if HttpSession.__shared is None:
+                HttpSession.__shared = HttpSession(pool_maxsize=max(pool_maxsize, HttpSession.DEFAULT_POOL_MAXSIZE))
+            else:
+                HttpSession.__shared.resize(pool_maxsize)
+
+            return HttpSession.__shared.session
+
+    @staticmethod
+    def reserve(connections):
+        HttpSession.shared(pool_maxsize=connections)
+
+        return
+
+    def __mount(self):
+        from requests.adapters import HTTPAdapter
+
+        # Requests already in flight finish on the adapter they started on
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=self.max_retries,
+                              pool_block=self.pool_block)
+
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        return
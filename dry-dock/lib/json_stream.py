@@ -0,0 +1,111 @@
+import codecs
+import json
+
+
+class JsonArrayStream:
+    __whitespace = ' \t\n\r'
+
+    def __init__(self, chunks, fields=None):
+        self.chunks = chunks
+        self.fields = fields
+
+        self.__decoder = json.JSONDecoder()
+
+        return
+
+    def __iter__(self):
+        for entry in self.__iter_entries():
+            yield self.project(entry, self.fields) if self.fields else entry
+
+    def __iter_entries(self):
+        utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+        chunks = iter(self.chunks)
+        buffer = ''
+        position = 0
+        exhausted = False
+
+        # What comes next: the opening '[', the first entry or ']', an entry after a ',', or a ',' or ']' after one
+        expected = 'array'
+
+        while True:
+            while position < len(buffer) and buffer[position] in self.__whitespace:
+                position += 1
+
+            if position < len(buffer):
+                character = buffer[position]
+
+                if expected == 'array':
+                    if character != '[':
+                        raise ValueError(f"Expected a JSON array, found {character!r}")
+
+                    expected = 'first'
+                    position += 1
+                    continue
+
+                if expected == 'separator':
+                    if character not in ',]':
+                        raise ValueError(f"Expected ',' or ']' in JSON array, found {character!r}")
+
+                    if character == ']':
+                        return
+
+                    expected = 'entry'
+                    position += 1
+                    continue
+
+                if character == ']' and expected == 'first':
+                    return
+
+                if character in ',]':
+                    raise ValueError(f"Expected a value in JSON array, found {character!r}")
+
+                try:
+                    entry, end = self.__decoder.raw_decode(buffer, position)
+
+                    # A value running up to the end of the buffer may be a truncated number or literal
+                    if end < len(buffer) or exhausted:
+                        yield entry
+
+                        buffer = buffer[end:]
+                        position = 0
+                        expected = 'separator'
+                        continue
+
+                except ValueError:
+                    if exhausted:
+                        raise
+
+            if exhausted:
+                raise ValueError("Unexpected end of JSON array")
+
+            try:
+                chunk = next(chunks)
+
+            except StopIteration:
+                exhausted = True
+                buffer += utf8_decoder.decode(b'', final=True)
+                continue
+
+            buffer += utf8_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    @staticmethod
+    def project(entry, fields):
+        projection = {}
+
+        for field in fields:
+            keys = field.split('.')
+
+            value = entry
+            for key in keys:
+                if not isinstance(value, dict) or key not in value:
+                    break
+
+                value = value[key]
+            else:
+                target = projection
+                for key in keys[:-1]:
+                    target = target.setdefault(key, {})
+
+                target[keys[-1]] = value
+
+        return projection
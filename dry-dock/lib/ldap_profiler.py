@@ -0,0 +1,213 @@
+import statistics
+import time
+
+from exception.unsupported_config_error import UnsupportedConfigError
+
+PAGED_RESULTS_CONTROL = '1.2.840.113556.1.4.319'
+
+
+class LdapProfiler:
+    DEFAULT_PAGE_SIZE = 500
+    DEFAULT_SAMPLES = 3
+
+    def __init__(self, ldap, user_search_configs, page_size=DEFAULT_PAGE_SIZE, samples=DEFAULT_SAMPLES,
+                 connection=None):
+        if samples < 1:
+            raise UnsupportedConfigError(f"LDAP profile samples must be at least 1: {samples}")
+
+        self.ldap = ldap
+        self.user_search_configs = user_search_configs
+        self.page_size = page_size
+        self.samples = samples
+        self.connection = connection
+
+        return
+
+    def connect(self):
+        # ldap3 is only needed for the pre-flight check, so it is not imported by the regular configuration run
+        import ssl
+        from ldap3 import Connection, NONE, Server, Tls
+
+        tls = Tls(validate=ssl.CERT_NONE if self.ldap.get('tls_skip_verify') else ssl.CERT_REQUIRED)
+        server = Server(self.ldap['server_url'], get_info=NONE, tls=tls)
+
+        # Ranged attributes are read explicitly, so that every request they take is counted
+        connection = Connection(server, user=self.ldap['reader_dn'], password=self.ldap['reader_password'],
+                                read_only=True, raise_exceptions=True, auto_range=False)
+        connection.open()
+
+        if self.ldap.get('start_tls') and not self.ldap['server_url'].lower().startswith('ldaps://'):
+            connection.start_tls()
+
+        connection.bind()
+
+        return connection
+
+    def profile(self):
+        connection = self.connection if self.connection is not None else self.connect()
+
+        filter_reports = []
+        iterate_reports = []
+
+        try:
+            # A single timing is skewed by server caches warming up and by network noise, so both searches are
+            # timed several times, alternating, and the medians are compared
+            for sample in range(self.samples):
+                filter_reports.append(self.profile_filter_search(connection))
+                iterate_reports.append(self.profile_group_iterate(connection))
+
+        finally:
+            if self.connection is None:
+                connection.unbind()
+
+        filter_report = self.__summarize(filter_reports)
+        iterate_report = self.__summarize(iterate_reports)
+
+        return {'filter_search': filter_report,
+                'group_iterate': iterate_report,
+                'recommendation': self.recommend(filter_report, iterate_report)}
+
+    def profile_filter_search(self, connection):
+        start = time.monotonic()
+
+        users, pages = self.__search(connection, self.user_search_configs['base_dn'], self.__scope(),
+                                     paged=not self.ldap.get('no_simple_pagination'))
+        requests = pages
+
+        matched = users
+        if self.__match_group():
+            members, member_requests = self.__group_members(connection)
+            requests += member_requests
+
+            member_dns = set(member.lower() for member in members)
+            matched = [user for user in users if user.lower() in member_dns]
+
+        return {'requests': requests,
+                'pages': pages,
+                'entries': len(users),
+                'matched': len(matched),
+                'latency': time.monotonic() - start}
+
+    def profile_group_iterate(self, connection):
+        if not self.__match_group():
+            return None
+
+        from ldap3 import BASE
+        from ldap3.core.exceptions import LDAPNoSuchObjectResult
+
+        start = time.monotonic()
+
+        members, requests = self.__group_members(connection)
+
+        # match_group_iterate reads every member entry on its own instead of running the broad user search
+        matched = 0
+        for member in members:
+            requests += 1
+
+            try:
+                entries, pages = self.__search(connection, member, BASE, paged=False)
+                matched += len(entries)
+
+            except LDAPNoSuchObjectResult:
+                continue
+
+        return {'requests': requests,
+                'pages': 0,
+                'entries': len(members),
+                'matched': matched,
+                'latency': time.monotonic() - start}
+
+    def recommend(self, filter_report, iterate_report):
+        if iterate_report is None:
+            return {'match_group_iterate': False,
+                    'reason': "match_group is not enabled, so only the filter search applies"}
+
+        iterate = iterate_report['latency'] < filter_report['latency']
+        faster, slower = (iterate_report, filter_report) if iterate else (filter_report, iterate_report)
+
+        return {'match_group_iterate': iterate,
+                'reason': f"{'Iterating over the group' if iterate else 'The filter search'} took "
+                          f"{faster['latency']:.3f}s with {faster['requests']} request(s), against "
+                          f"{slower['latency']:.3f}s with {slower['requests']} request(s), "
+                          f"median of {len(faster['samples'])} sample(s)"}
+
+    def __group_members(self, connection):
+        from ldap3 import BASE
+
+        member_attr = self.user_search_configs['match_group_member_attr']
+        range_prefix = f"{member_attr.lower()};range="
+
+        members = []
+        requests = 0
+        attribute = member_attr
+
+        while True:
+            connection.search(self.user_search_configs['match_group_dn'], '(objectClass=*)', BASE,
+                              attributes=[attribute])
+            requests += 1
+
+            entries = [entry for entry in connection.response if entry.get('type') == 'searchResEntry']
+            if not entries:
+                return members, requests
+
+            attributes = entries[0]['attributes']
+
+            # Active Directory returns the members of large groups in ranges, as member;range=0-1499, and the
+            # last range ends with *
+            ranged = next((name for name in attributes if name.lower().startswith(range_prefix)), None)
+            if ranged is None:
+                members.extend(attributes.get(member_attr) or [])
+                return members, requests
+
+            members.extend(attributes[ranged] or [])
+
+            high = ranged[len(range_prefix):].partition('-')[2]
+            if high == '*':
+                return members, requests
+
+            attribute = f"{member_attr};range={int(high) + 1}-*"
+
+    def __match_group(self):
+        return bool(self.user_search_configs.get('match_group') and
+                    self.user_search_configs.get('match_group_dn') and
+                    self.user_search_configs.get('match_group_member_attr'))
+
+    @staticmethod
+    def __summarize(reports):
+        if reports[0] is None:
+            return None
+
+        latencies = [report['latency'] for report in reports]
+
+        return dict(reports[-1], latency=statistics.median(latencies), samples=latencies)
+
+    def __scope(self):
+        from ldap3 import LEVEL, SUBTREE
+
+        return SUBTREE if self.user_search_configs.get('scope_subtree', True) else LEVEL
+
+    def __search(self, connection, base, scope, paged):
+        search_filter = self.user_search_configs.get('filter') or '(objectClass=*)'
+        attributes = [self.user_search_configs['username_attr'], self.user_search_configs['full_name_attr']]
+
+        dns = []
+        pages = 0
+        cookie = None
+
+        while True:
+            if paged:
+                connection.search(base, search_filter, scope, attributes=attributes, paged_size=self.page_size,
+                                  paged_cookie=cookie)
+            else:
+                connection.search(base, search_filter, scope, attributes=attributes)
+
+            pages += 1
+            dns.extend(entry['dn'] for entry in connection.response if entry.get('type') == 'searchResEntry')
+
+            if not paged:
+                return dns, pages
+
+            cookie = connection.result.get('controls', {}).get(PAGED_RESULTS_CONTROL, {}).get('value', {}).get('cookie')
+
+            if not cookie:
+                return dns, pages
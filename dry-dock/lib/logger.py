@@ -1,25 +1,111 @@
+import atexit
+import datetime
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+import threading
+
+from exception.unsupported_config_error import UnsupportedConfigError
 
 
 class Logger(logging.Logger):
-    def __init__(self, filename, log_level):
+    __listeners = {}
+    __lock = threading.Lock()
+
+    def __init__(self, filename, log_level, log_format='text'):
         name = os.path.basename(filename)
         super().__init__(name)
 
         self.setLevel(logging.getLevelName(log_level))
 
-        handler = logging.StreamHandler(sys.stdout)
-
-        formatter = logging.Formatter('%(asctime)s %(name)s [%(levelname)s] - %(message)s')
-        handler.setFormatter(formatter)
+        # Records are handed to a background thread so callers never block on stdout
+        handler = RawQueueHandler(self.__get_queue(log_format))
 
         self.addHandler(handler)
 
         return
 
     def prepare_execution(self, execution):
-        return f"{{ returncode: {execution.result.returncode}, " \
-               f"stdout: {execution.result.stdout}, " \
-               f"stderr: {execution.result.stderr} }}"
+        return PreparedExecution(execution)
+
+    def __get_queue(self, log_format):
+        if log_format not in ['json', 'text']:
+            raise UnsupportedConfigError(f"log_format: {log_format}")
+
+        with Logger.__lock:
+            listener_queue, listener, pid = Logger.__listeners.get(log_format, (None, None, None))
+
+            # Listener threads do not survive a fork, so worker processes start their own
+            if pid != os.getpid():
+                handler = logging.StreamHandler(sys.stdout)
+
+                if log_format == 'json':
+                    handler.setFormatter(JsonFormatter())
+                else:
+                    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s [%(levelname)s] - %(message)s'))
+
+                listener_queue = queue.Queue()
+                listener = logging.handlers.QueueListener(listener_queue, handler)
+                listener.start()
+
+                if not Logger.__listeners:
+                    atexit.register(Logger.flush)
+
+                Logger.__listeners[log_format] = (listener_queue, listener, os.getpid())
+
+            return listener_queue
+
+    @staticmethod
+    def flush():
+        with Logger.__lock:
+            for listener_queue, listener, pid in Logger.__listeners.values():
+                if pid == os.getpid():
+                    listener.stop()
+
+            Logger.__listeners.clear()
+
+        return
+
+
+class RawQueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        # QueueHandler formats the message and drops exc_info on the calling thread. The record is queued as it is,
+        # so the listener's handler formats it, tracebacks included, on the background thread. Arguments are only
+        # formatted then, so objects passed to the logger must not be changed afterwards.
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    __record_attributes = set(vars(logging.LogRecord('', 0, '', 0, '', None, None)).keys()) | {'message'}
+
+    def format(self, record):
+        entry = {'timestamp': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+                 'name': record.name,
+                 'level': record.levelname,
+                 'message': record.getMessage()}
+
+        for key, value in vars(record).items():
+            if key not in self.__record_attributes:
+                entry[key] = value
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class PreparedExecution:
+
+    def __init__(self, execution):
+        self.execution = execution
+
+        return
+
+    def __str__(self):
+        return f"{{ returncode: {self.execution.result.returncode}, " \
+               f"stdout: {self.execution.result.stdout}, " \
+               f"stderr: {self.execution.result.stderr} }}"
@@ -0,0 +1,156 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Metrics:
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = []
+        self.steps = []
+
+        self.__lock = threading.Lock()
+
+        return
+
+    def reset(self):
+        # Cleared in place, because API clients keep a reference to the Metrics object they were built with
+        with self.__lock:
+            self.started_at = time.time()
+            self.requests.clear()
+            self.steps.clear()
+
+        return
+
+    def record_request(self, method, endpoint, status, latency, request_bytes, response_bytes):
+        with self.__lock:
+            self.requests.append({'method': method,
+                                  'endpoint': endpoint,
+                                  'status': status,
+                                  'latency': latency,
+                                  'request_bytes': request_bytes,
+                                  'response_bytes': response_bytes})
+
+        return
+
+    def record_step(self, step, duration, status):
+        with self.__lock:
+            self.steps.append({'step': step,
+                               'duration': duration,
+                               'status': status})
+
+        return
+
+    @contextlib.contextmanager
+    def timer(self, step):
+        start = time.monotonic()
+        status = 'failure'
+
+        try:
+            yield
+            status = 'success'
+
+        finally:
+            self.record_step(step, time.monotonic() - start, status)
+
+    def report(self):
+        with self.__lock:
+            requests = list(self.requests)
+            steps = list(self.steps)
+
+        return {'started_at': self.started_at,
+                'requests': requests,
+                'steps': steps,
+                'totals': {'requests': len(requests),
+                           'request_latency': sum(request['latency'] for request in requests),
+                           'request_bytes': sum(request['request_bytes'] for request in requests),
+                           'response_bytes': sum(request['response_bytes'] for request in requests)}}
+
+    def prometheus(self):
+        report = self.report()
+
+        requests = collections.OrderedDict()
+        for request in report['requests']:
+            key = (request['method'], request['endpoint'], str(request['status']))
+            count, latency, response_bytes = requests.get(key, (0, 0.0, 0))
+            requests[key] = (count + 1, latency + request['latency'], response_bytes + request['response_bytes'])
+
+        lines = ['# HELP dry_dock_http_requests_total Requests made to the UCP and DTR APIs.',
+                 '# TYPE dry_dock_http_requests_total counter']
+        lines += [f"dry_dock_http_requests_total{self.__labels(key)} {count}"
+                  for key, (count, latency, response_bytes) in requests.items()]
+
+        lines += ['# HELP dry_dock_http_request_duration_seconds Latency of requests made to the UCP and DTR APIs.',
+                  '# TYPE dry_dock_http_request_duration_seconds summary']
+        for key, (count, latency, response_bytes) in requests.items():
+            lines.append(f"dry_dock_http_request_duration_seconds_sum{self.__labels(key)} {latency:.6f}")
+            lines.append(f"dry_dock_http_request_duration_seconds_count{self.__labels(key)} {count}")
+
+        lines += ['# HELP dry_dock_http_response_bytes_total Response payload bytes received from the UCP and DTR APIs.',
+                  '# TYPE dry_dock_http_response_bytes_total counter']
+        lines += [f"dry_dock_http_response_bytes_total{self.__labels(key)} {response_bytes}"
+                  for key, (count, latency, response_bytes) in requests.items()]
+
+        steps = collections.OrderedDict()
+        for step in report['steps']:
+            steps[step['step']] = step
+
+        lines += ['# HELP dry_dock_step_duration_seconds Duration of the last run of each step.',
+                  '# TYPE dry_dock_step_duration_seconds gauge']
+        lines += [f"dry_dock_step_duration_seconds{{step=\"{step['step']}\",status=\"{step['status']}\"}} "
+                  f"{step['duration']:.6f}" for step in steps.values()]
+
+        lines += ['# HELP dry_dock_run_timestamp_seconds Time the last run started.',
+                  '# TYPE dry_dock_run_timestamp_seconds gauge',
+                  f"dry_dock_run_timestamp_seconds {report['started_at']:.3f}"]
+
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, file):
+        self.__write(file, json.dumps(self.report(), indent=2))
+
+        return
+
+    def write_prometheus(self, file):
+        self.__write(file, self.prometheus())
+
+        return
+
+    def __labels(self, key):
+        method, endpoint, status = key
+
+        return f"{{method=\"{method}\",endpoint=\"{endpoint}\",status=\"{status}\"}}"
+
+    def __write(self, file, content):
+        # Written to a temporary file first so the textfile collector never reads a partial file
+        temp_file = f"{file}.{os.getpid()}.tmp"
+
+        with open(temp_file, 'w') as output:
+            output.write(content)
+
+        os.replace(temp_file, file)
+
+        return
+
+
+def timed(step):
+    # Records into the `metrics` global of the module defining the decorated function, when it has one
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = function.__globals__.get('metrics')
+
+            if metrics is None:
+                return function(*args, **kwargs)
+
+            with metrics.timer(step):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
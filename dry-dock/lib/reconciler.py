@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+from file_watcher import FileWatcher
+from task import Task
+
+
+class Reconciler:
+    DEFAULT_RESYNC_INTERVAL = 3600
+    STOP_CHECK_INTERVAL = 1.0
+
+    def __init__(self, conf_dir, task_names=None, resync_interval=DEFAULT_RESYNC_INTERVAL, watcher=None, logger=None):
+        self.conf_dir = conf_dir
+        self.resync_interval = resync_interval
+        self.watcher = watcher if watcher is not None else FileWatcher(logger=logger)
+        self.logger = logger
+        self.stop_event = threading.Event()
+
+        # Script modules are loaded once, so imports, the shared HTTP connection pool and cached tokens stay warm
+        self.tasks = [Task(task_name, conf_dir) for task_name in (task_names or Task.names())]
+        for task in self.tasks:
+            task.load()
+
+        self.__inputs = {}
+        self.__outputs = {}
+        for task in self.tasks:
+            self.__inputs[task.name] = [os.path.realpath(file) for file in task.config_files()]
+            self.__outputs[task.name] = [os.path.realpath(directory)
+                                         for directory in getattr(task.module, 'watched_directories', list)()]
+
+            for file in self.__inputs[task.name]:
+                self.watcher.watch(os.path.dirname(file))
+
+            for directory in self.__outputs[task.name]:
+                self.watcher.watch(directory, recursive=True)
+
+        return
+
+    def run(self):
+        self.reconcile(self.tasks, 'startup')
+
+        next_resync = time.monotonic() + self.resync_interval
+
+        while not self.stop_event.is_set():
+            changed = self.watcher.changes(timeout=min(max(next_resync - time.monotonic(), 0),
+                                                       self.STOP_CHECK_INTERVAL))
+
+            if time.monotonic() >= next_resync:
+                self.reconcile(self.tasks, 'periodic resync')
+                next_resync = time.monotonic() + self.resync_interval
+            elif changed:
+                tasks = self.affected_tasks(changed)
+
+                if tasks:
+                    self.reconcile(tasks, f"changed {', '.join(sorted(changed))}")
+
+        return
+
+    def stop(self):
+        self.stop_event.set()
+
+        return
+
+    def affected_tasks(self, changed):
+        affected = []
+        for task in self.tasks:
+            paths = self.__inputs[task.name] + self.__outputs[task.name]
+
+            if any(path == watched or path.startswith(f"{watched}{os.sep}") or watched.startswith(f"{path}{os.sep}")
+                   for path in changed for watched in paths):
+                affected.append(task)
+
+        return affected
+
+    def reconcile(self, tasks, reason):
+        results = {}
+
+        for task in tasks:
+            if self.stop_event.is_set():
+                break
+
+            self.logger.info("Reconciling %s (%s)", task.name, reason)
+
+            start = time.monotonic()
+            try:
+                task.configure()
+
+                # The daemon reuses each script module, so its metrics only cover the latest reconcile
+                metrics = getattr(task.module, 'metrics', None)
+                if metrics is not None:
+                    metrics.reset()
+
+                results[task.name] = task.run()
+
+                self.logger.info("Reconciled %s in %.2fs with %d request(s) (%s)", task.name,
+                                 time.monotonic() - start, len(metrics.requests) if metrics is not None else 0,
+                                 results[task.name])
+
+            except Exception:
+                results[task.name] = None
+
+                self.logger.exception("Reconciling %s failed after %.2fs, retrying on the next change or resync",
+                                      task.name, time.monotonic() - start)
+
+            # A task that writes its own watched directories, like a certbot renewal, must not trigger itself again
+            if self.__outputs[task.name]:
+                self.__discard_own_changes(task)
+
+        return results
+
+    def __discard_own_changes(self, task):
+        changed = self.watcher.changes(timeout=0)
+        others = {path for path in changed
+                  if not any(path == directory or path.startswith(f"{directory}{os.sep}")
+                             for directory in self.__outputs[task.name])}
+
+        tasks = self.affected_tasks(others)
+
+        if tasks:
+            self.reconcile(tasks, f"changed {', '.join(sorted(others))}")
+
+        return
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import time
+
+from file_lock import FileLock
+from task import Task
+
+COMPONENTS = ['dtr', 'ucp']
+DAY = 86400
+
+
+def registered_domain(domain):
+    # Approximates the public suffix list with the last two labels, which holds for the usual example.com zones
+    domain = domain.lower()
+    if domain.startswith('*.'):
+        domain = domain[2:]
+
+    return '.'.join(domain.split('.')[-2:])
+
+
+class RenewalScheduler:
+    __path = os.path.dirname(os.path.realpath(__file__))
+
+    DEFAULT_WINDOW_DAYS = 7
+    DEFAULT_REGISTERED_DOMAIN_LIMIT = 50
+    DEFAULT_REGISTERED_DOMAIN_PERIOD = 7 * DAY
+    DEFAULT_GLOBAL_LIMIT = 300
+    DEFAULT_GLOBAL_PERIOD = 3 * 3600
+    DEFAULT_INITIAL_BACKOFF = 300
+    DEFAULT_MAX_BACKOFF = DAY
+
+    def __init__(self, queue_path, conf_dirs, window_days=DEFAULT_WINDOW_DAYS,
+                 registered_domain_limit=DEFAULT_REGISTERED_DOMAIN_LIMIT,
+                 registered_domain_period=DEFAULT_REGISTERED_DOMAIN_PERIOD,
+                 global_limit=DEFAULT_GLOBAL_LIMIT, global_period=DEFAULT_GLOBAL_PERIOD,
+                 initial_backoff=DEFAULT_INITIAL_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF, logger=None):
+        self.queue_path = queue_path
+        self.conf_dirs = conf_dirs
+        self.window_days = window_days
+        self.registered_domain_limit = registered_domain_limit
+        self.registered_domain_period = registered_domain_period
+        self.global_limit = global_limit
+        self.global_period = global_period
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.logger = logger
+
+        self.__tasks = {}
+
+        return
+
+    def plan(self):
+        with self.__lock():
+            queue = self.__read()
+            self.refresh(queue)
+            self.__write(queue)
+
+        return sorted(queue['entries'].values(), key=lambda entry: entry['scheduled'])
+
+    def run(self):
+        lock = self.__lock(blocking=False)
+
+        try:
+            lock.acquire()
+
+        except BlockingIOError:
+            # Runs are started on a schedule, a run that finds the previous one still renewing leaves the queue to it
+            self.logger.info("Another run is still renewing certificates, skipping this run")
+            return []
+
+        # The lock is held for the whole run, so overlapping runs never renew the same certificate twice
+        try:
+            queue, results = self.__renew_due()
+
+        finally:
+            lock.release()
+
+        self.summarize(results, queue)
+
+        return results
+
+    def refresh(self, queue):
+        now = time.time()
+
+        # Entries of clusters whose configuration directory was removed would otherwise stay in the queue for good
+        for key, entry in list(queue['entries'].items()):
+            if not self.conf_dir_exists(entry['conf_dir']):
+                del queue['entries'][key]
+
+        for conf_dir in self.conf_dirs:
+            module = self.__task(conf_dir).module
+
+            renew_before_expiry_days = module.config['certbot'].get('renew_before_expiry_days',
+                                                                    module.DEFAULT_RENEW_BEFORE_EXPIRY_DAYS)
+
+            for component in COMPONENTS:
+                key = f"{conf_dir}/{component}"
+                domains = sorted(set(domain.lower() for domain in module.certificate_domains(component)))
+
+                not_after = None
+                matches = False
+
+                cert_directory = module.find_cert_directory(component)
+                if cert_directory is not None:
+                    # cryptography is only needed once there are certificates to read
+                    from certificate import Certificate
+
+                    try:
+                        certificate = Certificate(f"{cert_directory}/fullchain.pem")
+                        not_after = certificate.not_after.timestamp()
+                        matches = certificate.matches(domains)
+
+                    except (OSError, ValueError) as e:
+                        self.logger.warning(f"[{conf_dir}] Unable to read the {component.upper()} certificate: {e}")
+
+                entry = queue['entries'].get(key)
+
+                if entry is not None and entry['not_after'] == not_after and entry['domains'] == domains:
+                    continue
+
+                # A new or changed certificate starts over, without the backoff of the one it replaces
+                queue['entries'][key] = {'key': key,
+                                         'conf_dir': conf_dir,
+                                         'component': component,
+                                         'domains': domains,
+                                         'not_after': not_after,
+                                         'scheduled': self.schedule(key, not_after, renew_before_expiry_days)
+                                         if matches else now,
+                                         'attempts': 0,
+                                         'next_attempt': None,
+                                         'last_error': None}
+
+        return queue
+
+    def conf_dir_exists(self, conf_dir):
+        return os.path.isdir(f"{self.__path}/../conf/{conf_dir}")
+
+    def schedule(self, key, not_after, renew_before_expiry_days):
+        renew_from = not_after - renew_before_expiry_days * DAY
+
+        # The window never takes more than half of the renewal period, which leaves the rest for retries
+        window = min(self.window_days, renew_before_expiry_days / 2) * DAY
+
+        # Hashing the key spreads certificates that expire together evenly, and keeps each slot stable across runs
+        offset = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) / 0xffffffff
+
+        return renew_from + window * offset
+
+    def exhausted_budget(self, orders, entry, now):
+        if len([order for order in orders if order['time'] > now - self.global_period]) >= self.global_limit:
+            return 'global'
+
+        for domain in sorted(set(registered_domain(domain) for domain in entry['domains'])):
+            recent = [order for order in orders
+                      if order['time'] > now - self.registered_domain_period and domain in order['registered_domains']]
+
+            if len(recent) >= self.registered_domain_limit:
+                return domain
+
+        return None
+
+    def renew(self, queue, entry):
+        module = self.__task(entry['conf_dir']).module
+        component = entry['component']
+
+        self.logger.info(f"[{entry['conf_dir']}] Renewing the {component.upper()} certificate")
+
+        try:
+            issued = getattr(module, f"generate_{component}_certs")()
+
+            if issued or module.config['certbot']['always_apply_certs'][component]:
+                getattr(module, f"apply_{component}_certs")()
+
+        except Exception as e:
+            self.record_order(queue, entry)
+
+            entry['attempts'] += 1
+            entry['next_attempt'] = time.time() + min(self.max_backoff,
+                                                      self.initial_backoff * 2 ** (entry['attempts'] - 1))
+            entry['last_error'] = f"{type(e).__name__}: {e}"
+
+            self.logger.error(f"[{entry['conf_dir']}] {component.upper()} renewal failed, attempt "
+                              f"{entry['attempts']}, retrying after {time.ctime(entry['next_attempt'])} - "
+                              f"{entry['last_error']}")
+
+            return self.result(entry, 'failure', entry['last_error'])
+
+        if not issued:
+            # Certbot keeps a lineage it does not consider due yet, so the next run asks again
+            entry['next_attempt'] = time.time() + self.initial_backoff
+
+            return self.result(entry, 'unchanged')
+
+        self.record_order(queue, entry)
+
+        # The next run reads the new certificate and schedules its renewal
+        entry['attempts'] = 0
+        entry['next_attempt'] = None
+        entry['last_error'] = None
+
+        return self.result(entry, 'renewed')
+
+    def record_order(self, queue, entry):
+        queue['orders'].append({'time': time.time(),
+                                'registered_domains': sorted(set(registered_domain(domain)
+                                                                 for domain in entry['domains']))})
+
+        return
+
+    def result(self, entry, status, detail=None):
+        return {'conf_dir': entry['conf_dir'],
+                'component': entry['component'],
+                'status': status,
+                'detail': detail}
+
+    def summarize(self, results, queue):
+        outcomes = {'renewed': 'renewed', 'unchanged': 'not yet due', 'deferred': 'deferred', 'failure': 'failed'}
+
+        for status, outcome in outcomes.items():
+            count = len([result for result in results if result['status'] == status])
+
+            if count:
+                self.logger.info(f"{count} certificate(s) {outcome}")
+
+        upcoming = [entry['scheduled'] for entry in queue['entries'].values() if entry['scheduled'] > time.time()]
+
+        if upcoming:
+            self.logger.info(f"Next renewal scheduled for {time.ctime(min(upcoming))}")
+
+        return
+
+    def __renew_due(self):
+        results = []
+
+        queue = self.__read()
+        self.refresh(queue)
+        self.__write(queue)
+
+        now = time.time()
+
+        due = [entry for entry in queue['entries'].values()
+               if entry['conf_dir'] in self.conf_dirs and entry['scheduled'] <= now and
+               (entry['next_attempt'] or 0) <= now]
+
+        # Certificates closest to expiry are renewed first when the budgets do not cover every due certificate
+        due.sort(key=lambda entry: (entry['not_after'] or 0, entry['key']))
+
+        self.logger.info(f"{len(due)} of {len(queue['entries'])} certificate(s) due for renewal")
+
+        for entry in due:
+            budget = self.exhausted_budget(queue['orders'], entry, time.time())
+
+            if budget is not None:
+                self.logger.info(f"[{entry['conf_dir']}] {entry['component'].upper()} renewal deferred, "
+                                 f"{budget} budget exhausted")
+                results.append(self.result(entry, 'deferred', budget))
+                continue
+
+            results.append(self.renew(queue, entry))
+            self.__write(queue)
+
+        return queue, results
+
+    def __task(self, conf_dir):
+        if conf_dir not in self.__tasks:
+            self.__tasks[conf_dir] = Task('certs', conf_dir)
+            self.__tasks[conf_dir].load()
+
+        return self.__tasks[conf_dir]
+
+    def __lock(self, blocking=True):
+        os.makedirs(os.path.dirname(os.path.abspath(self.queue_path)), mode=0o700, exist_ok=True)
+
+        return FileLock(f"{self.queue_path}.lock", blocking=blocking)
+
+    def __read(self):
+        try:
+            with open(self.queue_path) as file:
+                queue = json.load(file)
+
+        except (FileNotFoundError, ValueError):
+            queue = {}
+
+        queue.setdefault('entries', {})
+
+        oldest = time.time() - max(self.registered_domain_period, self.global_period)
+        queue['orders'] = [order for order in queue.get('orders', []) if order['time'] > oldest]
+
+        return queue
+
+    def __write(self, queue):
+        temp_path = f"{self.queue_path}.{os.getpid()}.tmp"
+
+        with open(temp_path, 'w') as file:
+            json.dump(queue, file, indent=2, sort_keys=True)
+
+        os.replace(temp_path, self.queue_path)
+
+        return
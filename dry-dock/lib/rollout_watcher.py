@@ -0,0 +1,229 @@
+import collections.abc
+import datetime
+import json
+import time
+
+from exception.api_response_error import ApiResponseError
+from exception.rollout_failed_error import RolloutFailedError
+from exception.rollout_timeout_error import RolloutTimeoutError
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+
+    # Docker timestamps carry nanoseconds, which datetime cannot hold
+    date, _, fraction = value.rstrip('Z').partition('.')
+    timestamp = datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+
+    return timestamp + datetime.timedelta(microseconds=int((fraction + '000000')[:6]))
+
+
+def is_transient(error):
+    if isinstance(error, ApiResponseError):
+        return error.status_code >= 500 or error.status_code in [408, 429]
+
+    # requests raises connection errors and read timeouts as OSError subclasses
+    return isinstance(error, OSError)
+
+
+class RolloutWatcher:
+    DEFAULT_TIMEOUT = 600
+    DEFAULT_INITIAL_INTERVAL = 1.0
+    DEFAULT_MAX_INTERVAL = 30.0
+
+    FAILED_STATES = ['paused', 'rollback_started', 'rollback_paused', 'rollback_completed']
+
+    def __init__(self, ucp_api, timeout=DEFAULT_TIMEOUT, initial_interval=DEFAULT_INITIAL_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, use_events=True, logger=None):
+        self.ucp_api = ucp_api
+        self.timeout = timeout
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.use_events = use_events
+        self.logger = logger
+
+        return
+
+    def wait(self, service_id):
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        timeline = []
+        states = {}
+
+        def record(source, entry_id, state, node=None, message=None):
+            if states.get((source, entry_id)) == state:
+                return False
+
+            states[(source, entry_id)] = state
+            timeline.append({'time': round(time.monotonic() - start, 3),
+                             'source': source,
+                             'id': entry_id,
+                             'node': node,
+                             'state': state,
+                             'message': message})
+
+            self.logger.debug("Rollout of %s: %s %s is %s", service_id, source, entry_id, state)
+
+            return True
+
+        def check():
+            try:
+                service = self.ucp_api.get_service(service_id)
+                tasks = self.ucp_api.find_tasks(json.dumps({'service': [service_id]}))
+
+            except (ApiResponseError, OSError) as e:
+                # Updating ucp-agent restarts the UCP controllers, so UCP is expected to drop out during the rollout
+                if not is_transient(e):
+                    raise
+
+                record('api', self.ucp_api.endpoint, 'unavailable', message=str(e))
+
+                return False
+
+            if states.get(('api', self.ucp_api.endpoint)) == 'unavailable':
+                record('api', self.ucp_api.endpoint, 'available')
+
+            return self.__check(service_id, service, tasks, record, timeline)
+
+        if self.use_events:
+            converged = self.__wait_for_events(service_id, check, deadline)
+        else:
+            converged = None
+
+        # The events stream is not available to every user, so fall back to polling
+        if converged is None:
+            converged = self.__wait_for_polls(check, timeline, deadline)
+
+        if not converged:
+            raise RolloutTimeoutError(f"Rollout of {service_id} did not converge within {self.timeout} seconds: "
+                                      f"{json.dumps(timeline)}")
+
+        duration = time.monotonic() - start
+
+        self.logger.info("Rollout of %s converged in %.2fs after %s state change(s)", service_id, duration,
+                         len(timeline))
+
+        return {'service': service_id,
+                'duration': duration,
+                'timeline': timeline}
+
+    @staticmethod
+    def from_config(settings, ucp_api, logger=None):
+        wait_for_rollout = settings.get('wait_for_rollout')
+
+        if not wait_for_rollout:
+            return None
+        elif not isinstance(wait_for_rollout, collections.abc.Mapping):
+            wait_for_rollout = {}
+
+        return RolloutWatcher(ucp_api,
+                              timeout=wait_for_rollout.get('timeout', RolloutWatcher.DEFAULT_TIMEOUT),
+                              initial_interval=wait_for_rollout.get('initial_interval',
+                                                                    RolloutWatcher.DEFAULT_INITIAL_INTERVAL),
+                              max_interval=wait_for_rollout.get('max_interval', RolloutWatcher.DEFAULT_MAX_INTERVAL),
+                              use_events=wait_for_rollout.get('use_events', True),
+                              logger=logger)
+
+    def __check(self, service_id, service, tasks, record, timeline):
+        for task in tasks:
+            record('task', task['ID'], task['Status']['State'], node=task.get('NodeID'),
+                   message=task['Status'].get('Err') or task['Status'].get('Message'))
+
+        updated_at = parse_timestamp(service.get('UpdatedAt'))
+        update_status = service.get('UpdateStatus') or {}
+
+        # UpdateStatus is kept after a rollout, so a status that started before the last update is stale
+        if update_status and self.__not_before(update_status.get('StartedAt'), updated_at):
+            record('service', service_id, update_status['State'], message=update_status.get('Message'))
+
+            if update_status['State'] in self.FAILED_STATES:
+                raise RolloutFailedError(f"Rollout of {service_id} {update_status['State']}: "
+                                         f"{update_status.get('Message')} {json.dumps(timeline)}")
+
+            if update_status['State'] == 'completed':
+                return True
+
+        # Without an update status, the rollout is done once every task created after the update is running
+        desired = [task for task in tasks if task.get('DesiredState') == 'running']
+
+        return bool(desired) and all(task['Status']['State'] == 'running' and
+                                     self.__not_before(task.get('CreatedAt'), updated_at) for task in desired)
+
+    def __not_before(self, value, updated_at):
+        timestamp = parse_timestamp(value)
+
+        return updated_at is None or timestamp is not None and timestamp >= updated_at
+
+    def __wait_for_events(self, service_id, check, deadline):
+        filters = json.dumps({'type': ['service'], 'service': [service_id]})
+
+        since = time.time()
+        converged = check()
+
+        while not converged and time.monotonic() < deadline:
+            # The stream is reopened at least every max_interval, which doubles as a safety check
+            window = min(self.max_interval, deadline - time.monotonic())
+            until = time.time() + window
+            interrupted = False
+
+            try:
+                for event in self.ucp_api.iter_events(filters=filters, since=since, until=until,
+                                                      timeout=window + self.max_interval):
+                    since = event.get('timeNano', since * 1e9) / 1e9
+
+                    if event.get('Action') == 'update':
+                        converged = check()
+
+                        if converged:
+                            break
+                else:
+                    since = until
+
+            except RolloutFailedError:
+                raise
+
+            except (OSError, ValueError) as e:
+                self.logger.debug("Events stream for %s was interrupted: %s", service_id, e)
+                interrupted = True
+
+            except ApiResponseError as e:
+                if not is_transient(e):
+                    self.logger.warning("Unable to stream events, polling instead: %s", e)
+                    return None
+
+                self.logger.debug("Events stream for %s is unavailable: %s", service_id, e)
+                interrupted = True
+
+            except Exception as e:
+                self.logger.warning("Unable to stream events, polling instead: %s", e)
+                return None
+
+            if not converged:
+                converged = check()
+
+            # A stream that fails straight away is not reopened before the next poll would have been due
+            if interrupted and not converged:
+                time.sleep(min(self.initial_interval, max(deadline - time.monotonic(), 0)))
+
+        return converged
+
+    def __wait_for_polls(self, check, timeline, deadline):
+        interval = self.initial_interval
+        progress = len(timeline)
+
+        while True:
+            converged = check()
+
+            if converged or time.monotonic() >= deadline:
+                return converged
+
+            # Back off while nothing changes, and poll quickly again once tasks start moving
+            if len(timeline) != progress:
+                progress = len(timeline)
+                interval = self.initial_interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
@@ -0,0 +1,98 @@
+import os
+import re
+import threading
+import time
+
+from secret_resolvers.environment import Environment
+from secret_resolvers.file import File
+from secret_resolvers.http_store import HttpStore
+
+
+class SecretReference:
+
+    def __init__(self, reference):
+        self.reference = reference
+
+        return
+
+    def __repr__(self):
+        return f"SecretReference({self.reference!r})"
+
+
+class SecretResolver:
+    __lock = threading.Lock()
+    __shared = None
+
+    __variable_pattern = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+    DEFAULT_TTL = 300
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+
+        self.__backends = {'env': Environment(),
+                           'file': File(),
+                           'http': HttpStore(),
+                           'https': HttpStore()}
+        self.__cache = {}
+        self.__cache_lock = threading.Lock()
+
+        return
+
+    def register(self, scheme, backend):
+        self.__backends[scheme] = backend
+
+        return
+
+    def resolve(self, reference):
+        if isinstance(reference, SecretReference):
+            reference = reference.reference
+
+        with self.__cache_lock:
+            cached = self.__cache.get(reference)
+
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+
+        scheme, location = self.__parse(reference)
+
+        try:
+            backend = self.__backends[scheme]
+
+        except KeyError:
+            raise Exception(f"Unsupported secret backend: {scheme}")
+
+        secret = backend.resolve(location)
+
+        with self.__cache_lock:
+            self.__cache[reference] = (secret, time.monotonic() + self.ttl)
+
+        return secret
+
+    def clear(self):
+        with self.__cache_lock:
+            self.__cache.clear()
+
+        return
+
+    def __parse(self, reference):
+        if reference.startswith(('http://', 'https://')):
+            return reference.split(':', 1)[0], reference
+
+        if re.match(r'^[a-z]+:', reference):
+            return reference.split(':', 1)
+
+        # A bare name is an environment variable holding the path of the secret file
+        if self.__variable_pattern.match(reference):
+            return 'file', Environment().resolve(reference)
+
+        return 'file', reference
+
+    @staticmethod
+    def shared():
+        with SecretResolver.__lock:
+            if SecretResolver.__shared is None:
+                SecretResolver.__shared = SecretResolver(ttl=int(os.environ.get('DRY_DOCK_SECRET_TTL',
+                                                                                SecretResolver.DEFAULT_TTL)))
+
+            return SecretResolver.__shared
@@ -0,0 +1,11 @@
+import os
+
+
+class Environment:
+
+    def resolve(self, reference):
+        try:
+            return os.environ[reference].strip()
+
+        except KeyError:
+            raise Exception(f"Environment variable {reference} is not set")
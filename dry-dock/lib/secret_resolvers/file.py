@@ -0,0 +1,5 @@
+class File:
+
+    def resolve(self, reference):
+        with open(reference) as file:
+            return file.read().strip()
@@ -0,0 +1,19 @@
+class HttpStore:
+
+    def __init__(self, session=None, timeout=10):
+        self.session = session
+        self.timeout = timeout
+
+        return
+
+    def resolve(self, reference):
+        from http_session import HttpSession
+
+        session = self.session if self.session is not None else HttpSession.shared()
+
+        response = session.get(url=reference, timeout=self.timeout)
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to read secret from {reference} - {response.status_code}")
+
+        return response.text.strip()
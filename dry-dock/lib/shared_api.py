@@ -0,0 +1,44 @@
+import threading
+
+
+class SharedApi:
+
+    def __init__(self, api, login_method, logout_method):
+        self.api = api
+        self.login_method = login_method
+        self.logout_method = logout_method
+
+        self.__lock = threading.Lock()
+        self.__logged_in = False
+        self.__login_result = None
+
+        return
+
+    def __getattr__(self, name):
+        if name == self.login_method:
+            return self.__login
+        elif name == self.logout_method:
+            return self.__logout
+
+        return getattr(self.api, name)
+
+    def close(self):
+        with self.__lock:
+            if self.__logged_in:
+                getattr(self.api, self.logout_method)()
+                self.__logged_in = False
+
+        return
+
+    def __login(self, *args, **kwargs):
+        # The first caller logs in, every later caller reuses that session
+        with self.__lock:
+            if not self.__logged_in:
+                self.__login_result = getattr(self.api, self.login_method)(*args, **kwargs)
+                self.__logged_in = True
+
+            return self.__login_result
+
+    def __logout(self, *args, **kwargs):
+        # Other tasks may still be using the session, it is closed once by the owner of this instance
+        return None
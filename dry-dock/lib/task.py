@@ -0,0 +1,81 @@
+import importlib.util
+import os
+
+from config_loader import ConfigLoader
+from exception.unsupported_task_error import UnsupportedTaskError
+from logger import Logger
+
+
+class Task:
+    __path = os.path.dirname(os.path.realpath(__file__))
+
+    __task_map = {
+        'auth': ('configure-authentication-and-authorization.py', 'configure_authentication_and_authorization',
+                 ['auth', 'logging', 'ucp']),
+        'certs': ('cert-management-certbot.py', 'manage_certs',
+                  ['certbot', 'dtr', 'logging', 'ucp']),
+        'config-gc': ('prune-ucp-configs.py', 'prune_ucp_configs',
+                      ['logging', 'ucp']),
+        'l7-routing': ('configure-layer-7-routing.py', 'configure_layer_7_routing',
+                       ['interlock', 'logging', 'ucp'])
+    }
+
+    def __init__(self, name, conf_dir):
+        try:
+            script, entry_point, configs = self.__task_map[name]
+
+        except KeyError as e:
+            raise UnsupportedTaskError(e)
+
+        self.name = name
+        self.conf_dir = conf_dir
+        self.script = os.path.realpath(f"{self.__path}/../bin/{script}")
+        self.script_name = script
+        self.entry_point = entry_point
+        self.configs = configs
+        self.module = None
+
+        return
+
+    def load(self):
+        # Every task gets a private copy of its script module so the module level config, logger and API
+        # client globals of one cluster never leak into another running in the same process.
+        module_name = f"dry_dock_task_{self.name.replace('-', '_')}_{id(self)}"
+
+        spec = importlib.util.spec_from_file_location(module_name, self.script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        self.module = module
+        self.configure()
+
+        return module
+
+    def configure(self):
+        # Gives an already loaded module a fresh view of its configuration files
+        self.module.config = ConfigLoader(self.conf_dir).load()
+        self.module.logger = Logger(filename=f"{os.path.basename(self.script)}[{self.conf_dir}]",
+                                    log_level=self.module.config['logging']['log_level'],
+                                    log_format=self.module.config['logging'].get('log_format', 'text'))
+
+        # API clients are built from the configuration, so the script builds new ones unless they are injected again
+        for client in ['dtr_api', 'ucp_api']:
+            if hasattr(self.module, client):
+                setattr(self.module, client, None)
+
+        return self.module
+
+    def config_files(self):
+        config_loader = ConfigLoader(self.conf_dir)
+
+        return [config_loader.config_file(config) for config in self.configs]
+
+    def run(self):
+        if self.module is None:
+            self.load()
+
+        return getattr(self.module, self.entry_point)()
+
+    @staticmethod
+    def names():
+        return sorted(Task.__task_map.keys())
@@ -0,0 +1,209 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config_loader import ConfigLoader
+from dtr_api import DtrApi
+from exception.unsupported_task_error import UnsupportedTaskError
+from http_session import HttpSession
+from metrics import Metrics
+from shared_api import SharedApi
+from task import Task
+from token_cache import TokenCache
+from ucp_api import UcpApi
+
+
+class TaskGraph:
+    # auth updates the ucp-agent service, which restarts the UCP controllers that Interlock is configured through.
+    # config-gc runs last so that it also prunes the configs the other tasks just replaced.
+    DEFAULT_DEPENDENCIES = {
+        'auth': [],
+        'certs': [],
+        'config-gc': ['auth', 'l7-routing'],
+        'l7-routing': ['auth']
+    }
+
+    # certs may be replacing an expired or invalid certificate that UCP serves, so it keeps its own client, which does
+    # not verify TLS, instead of the shared one built with verify_ssl from ucp.yml
+    UNSHARED_CLIENTS = {
+        'certs': ['ucp_api']
+    }
+
+    def __init__(self, conf_dir, task_names=None, dependencies=None, workers=None, logger=None):
+        self.conf_dir = conf_dir
+        self.task_names = sorted(task_names or Task.names())
+        self.workers = workers or len(self.task_names)
+        self.logger = logger
+        self.metrics = Metrics()
+
+        dependencies = dependencies if dependencies is not None else self.DEFAULT_DEPENDENCIES
+
+        # Dependencies on tasks that are not part of this run are dropped, so any subset of tasks can run
+        self.dependencies = {task_name: [dependency for dependency in dependencies.get(task_name, [])
+                                         if dependency in self.task_names]
+                             for task_name in self.task_names}
+
+        self.__check_acyclic()
+
+        return
+
+    def run(self):
+        config = ConfigLoader(self.conf_dir).load()
+        tasks = {task_name: Task(task_name, self.conf_dir) for task_name in self.task_names}
+
+        shared_apis = self.__shared_apis(config, tasks)
+
+        for task in tasks.values():
+            task.load()
+
+            # Steps and the requests of clients a task builds itself are reported together with the shared clients
+            if hasattr(task.module, 'metrics'):
+                task.module.metrics = self.metrics
+
+            for client, shared_api in shared_apis.items():
+                if hasattr(task.module, client) and client not in self.UNSHARED_CLIENTS.get(task.name, []):
+                    setattr(task.module, client, shared_api)
+
+        self.logger.info("Running %s with %s worker(s)", ', '.join(self.task_names), self.workers)
+
+        nodes = {task_name: {'task': task_name,
+                             'status': 'pending',
+                             'depends_on': self.dependencies[task_name]}
+                 for task_name in self.task_names}
+
+        HttpSession.reserve(self.workers)
+
+        start = time.monotonic()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                running = {}
+
+                while True:
+                    for task_name, node in nodes.items():
+                        if node['status'] != 'pending':
+                            continue
+
+                        statuses = [nodes[dependency]['status'] for dependency in node['depends_on']]
+
+                        if any(status in ['failure', 'skipped'] for status in statuses):
+                            node['status'] = 'skipped'
+
+                            self.logger.warning("Skipping %s, a task it depends on did not succeed", task_name)
+                        elif all(status == 'success' for status in statuses):
+                            node['status'] = 'running'
+                            node['start'] = time.monotonic() - start
+
+                            running[pool.submit(tasks[task_name].run)] = task_name
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        node = nodes[running.pop(future)]
+                        node['finish'] = time.monotonic() - start
+                        node['duration'] = node['finish'] - node['start']
+
+                        try:
+                            node['result'] = future.result()
+                            node['status'] = 'success'
+
+                        except Exception as e:
+                            node['error'] = f"{type(e).__name__}: {e}"
+                            node['status'] = 'failure'
+
+        finally:
+            for shared_api in shared_apis.values():
+                shared_api.close()
+
+        results = [nodes[task_name] for task_name in self.task_names]
+
+        self.summarize(results, self.critical_path(nodes), time.monotonic() - start)
+
+        return results
+
+    def critical_path(self, nodes):
+        finished = [node for node in nodes.values() if 'finish' in node]
+
+        if not finished:
+            return []
+
+        # Walk back from the task that finished last through the dependency that finished last
+        path = [max(finished, key=lambda node: node['finish'])]
+        while path[-1]['depends_on']:
+            path.append(max((nodes[dependency] for dependency in path[-1]['depends_on']),
+                            key=lambda node: node['finish']))
+
+        return [node['task'] for node in reversed(path)]
+
+    def summarize(self, results, critical_path, duration):
+        for result in results:
+            if result['status'] == 'success':
+                outcome = f" ({result['result']})" if result['result'] is not None else ''
+
+                self.logger.info("%s success, started at %.2fs, took %.2fs%s", result['task'], result['start'],
+                                 result['duration'], outcome)
+            elif result['status'] == 'failure':
+                self.logger.error("%s failure, started at %.2fs, took %.2fs - %s", result['task'], result['start'],
+                                  result['duration'], result['error'])
+            else:
+                self.logger.error("%s skipped", result['task'])
+
+        durations = {result['task']: result.get('duration', 0) for result in results}
+
+        self.logger.info("Critical path %s took %.2fs, total %.2fs",
+                         ' -> '.join(critical_path) or 'none', sum(durations[task] for task in critical_path),
+                         duration)
+
+        return
+
+    def __check_acyclic(self):
+        visited = set()
+
+        def visit(task_name, path):
+            if task_name in path:
+                raise UnsupportedTaskError(f"Dependency cycle: {' -> '.join(path + [task_name])}")
+
+            if task_name not in visited:
+                for dependency in self.dependencies[task_name]:
+                    visit(dependency, path + [task_name])
+
+                visited.add(task_name)
+
+            return
+
+        for task_name in self.task_names:
+            visit(task_name, [])
+
+        return
+
+    def __shared_apis(self, config, tasks):
+        shared_apis = {}
+
+        if any('ucp' in task.configs and 'ucp_api' not in self.UNSHARED_CLIENTS.get(task.name, [])
+               for task in tasks.values()):
+            ucp_api = UcpApi(endpoint=config['ucp']['endpoint'],
+                             username=config['ucp']['username'],
+                             password=config['ucp']['password'],
+                             use_ssl=config['ucp']['use_ssl'],
+                             verify_ssl=config['ucp']['verify_ssl'],
+                             logger=self.logger,
+                             metrics=self.metrics,
+                             token_cache=TokenCache.from_config(config['ucp']))
+
+            shared_apis['ucp_api'] = SharedApi(ucp_api, login_method='login', logout_method='logout')
+
+        if any('dtr' in task.configs for task in tasks.values()):
+            dtr_api = DtrApi(endpoint=config['dtr']['endpoint'],
+                             username=config['dtr']['credentials']['username'],
+                             password=config['dtr']['credentials']['password'],
+                             use_ssl=config['dtr']['use_ssl'],
+                             verify_ssl=False,
+                             logger=self.logger,
+                             metrics=self.metrics,
+                             token_cache=TokenCache.from_config(config['dtr']))
+
+            shared_apis['dtr_api'] = SharedApi(dtr_api, login_method='create_token', logout_method='delete_token')
+
+        return shared_apis
@@ -0,0 +1,39 @@
+import hashlib
+import socket
+import ssl
+
+
+class TlsProbe:
+    DEFAULT_PORT = 443
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+
+        return
+
+    def served_fingerprint(self, host, port=DEFAULT_PORT):
+        # Only the served leaf is compared, so the handshake does not need to validate the chain
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+        with socket.create_connection((host, port), timeout=self.timeout) as connection:
+            with context.wrap_socket(connection, server_hostname=host) as tls_connection:
+                certificate = tls_connection.getpeercert(binary_form=True)
+
+        return hashlib.sha256(certificate).hexdigest()
+
+    def served_fingerprint_for(self, address):
+        host, separator, port = address.rpartition(':')
+
+        if not separator or not port.isdigit():
+            return self.served_fingerprint(address)
+
+        return self.served_fingerprint(host, int(port))
+
+    @staticmethod
+    def file_fingerprint(file):
+        with open(file) as pem:
+            leaf = pem.read().split('-----END CERTIFICATE-----')[0] + '-----END CERTIFICATE-----\n'
+
+        return hashlib.sha256(ssl.PEM_cert_to_DER_cert(leaf)).hexdigest()
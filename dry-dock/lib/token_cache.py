@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+from file_lock import FileLock
+
+
+class TokenCache:
+    DEFAULT_TTL = 1800
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+
+        return
+
+    def get(self, endpoint, username, include_expired=False):
+        with self.__lock():
+            entries = self.__read()
+
+        entry = entries.get(self.__key(endpoint, username))
+
+        if entry is None or (not include_expired and self.expired(entry)):
+            return None
+
+        return entry
+
+    def expired(self, entry):
+        return entry['expires'] <= time.time()
+
+    def put(self, endpoint, username, **values):
+        entry = dict(values)
+        entry['expires'] = time.time() + self.ttl
+
+        with self.__lock():
+            entries = self.__read()
+            entries[self.__key(endpoint, username)] = entry
+            self.__write(entries)
+
+        return entry
+
+    def delete(self, endpoint, username):
+        with self.__lock():
+            entries = self.__read()
+
+            if entries.pop(self.__key(endpoint, username), None) is not None:
+                self.__write(entries)
+
+        return
+
+    def __key(self, endpoint, username):
+        return f"{endpoint}|{username}"
+
+    def __lock(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+
+        return FileLock(f"{self.path}.lock")
+
+    def __read(self):
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+
+        except (FileNotFoundError, ValueError):
+            return {}
+
+        # Expired entries are kept until they are replaced, so that tokens which outlive them can still be revoked
+        return entries
+
+    def __write(self, entries):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(entries, file)
+
+        os.replace(temp_path, self.path)
+
+        return
+
+    @staticmethod
+    def from_config(settings):
+        if not settings.get('token_cache'):
+            return None
+
+        return TokenCache(path=settings['token_cache']['path'],
+                          ttl=settings['token_cache'].get('ttl', TokenCache.DEFAULT_TTL))
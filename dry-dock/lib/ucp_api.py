@@ -1,16 +1,25 @@
-import requests
+import json
+import time
+
+from exception.api_response_error import ApiResponseError
+from http_session import HttpSession
+from json_stream import JsonArrayStream
 
 
 class UcpApi:
 
-    def __init__(self, endpoint, username, password, use_ssl=True, verify_ssl=True, logger=None):
+    def __init__(self, endpoint, username, password, use_ssl=True, verify_ssl=True, logger=None,
+                 session=None, token_cache=None, metrics=None):
         self.endpoint = endpoint
         self.username = username
         self.password = password
         self.verify_ssl = verify_ssl
         self.logger = logger
+        self.session = session if session is not None else HttpSession.shared()
+        self.token_cache = token_cache
+        self.metrics = metrics
 
-        self.uri = f"https://{endpoint}" if use_ssl else f"https://{endpoint}"
+        self.uri = f"https://{endpoint}" if use_ssl else f"http://{endpoint}"
         self.__session_token = None
 
         return
@@ -18,7 +27,7 @@ class UcpApi:
     def create_config(self, body):
         url = f"{self.uri}/configs/create"
 
-        response = self.__post_request(url=url, body=body)
+        response = self.__post_request(url=url, endpoint='/configs/create', body=body)
 
         if response.status_code != 200:
             raise Exception("Failed to create config - %s" % response.status_code)
@@ -31,7 +40,7 @@ class UcpApi:
                 "HTTPSPort": https_port,
                 "Arch": arch}
 
-        response = self.__post_request(url=url, body=body)
+        response = self.__post_request(url=url, endpoint='/api/interlock', body=body)
 
         if response.status_code == 400:
             self.logger.warning(response.json()['message'])
@@ -40,10 +49,20 @@ class UcpApi:
 
         return response
 
+    def delete_config(self, config_id):
+        url = f"{self.uri}/configs/{config_id}"
+
+        response = self.__delete_request(url=url, endpoint='/configs/{id}')
+
+        if response.status_code not in [200, 204]:
+            raise Exception(f"Failed to delete config {config_id} - {response.status_code}")
+
+        return response
+
     def delete_interlock(self):
         url = f"{self.uri}/api/interlock"
 
-        response = self.__delete_request(url=url)
+        response = self.__delete_request(url=url, endpoint='/api/interlock')
 
         if response.status_code != 204:
             raise Exception(f"Failed to delete interlock - {response.status_code}")
@@ -53,17 +72,27 @@ class UcpApi:
     def get_config(self, config_id):
         url = f"{self.uri}/configs/{config_id}"
 
-        response = self.__get_request(url=url)
+        response = self.__get_request(url=url, endpoint='/configs/{id}')
 
         if response.status_code != 200:
             raise Exception(f"Failed to find configs - {response.status_code}")
 
         return response.json()
 
+    def get_service(self, service_id):
+        url = f"{self.uri}/services/{service_id}"
+
+        response = self.__get_request(url=url, endpoint='/services/{id}')
+
+        if response.status_code != 200:
+            raise ApiResponseError(f"Failed to get service - {response.status_code}", response.status_code)
+
+        return response.json()
+
     def get_interlock(self):
         url = f"{self.uri}/api/interlock"
 
-        response = self.__get_request(url=url)
+        response = self.__get_request(url=url, endpoint='/api/interlock')
 
         if response.status_code != 200:
             raise Exception(f"Failed to get interlock - {response.status_code}")
@@ -77,7 +106,7 @@ class UcpApi:
         if filters:
             params = {'filters': filters}
 
-        response = self.__get_request(url=url, params=params)
+        response = self.__get_request(url=url, endpoint='/configs', params=params)
 
         if response.status_code != 200:
             raise Exception(f"Failed to find configs - {response.status_code}")
@@ -91,22 +120,97 @@ class UcpApi:
         if filters:
             params = {'filters': filters}
 
-        response = self.__get_request(url=url, params=params)
+        response = self.__get_request(url=url, endpoint='/services', params=params)
 
         if response.status_code != 200:
             raise Exception(f"Failed to find services - {response.status_code}")
 
         return response.json()
 
+    def find_tasks(self, filters=None):
+        url = f"{self.uri}/tasks"
+
+        params = None
+        if filters:
+            params = {'filters': filters}
+
+        response = self.__get_request(url=url, endpoint='/tasks', params=params)
+
+        if response.status_code != 200:
+            raise ApiResponseError(f"Failed to find tasks - {response.status_code}", response.status_code)
+
+        return response.json()
+
+    def iter_configs(self, filters=None, fields=None):
+        url = f"{self.uri}/configs"
+
+        yield from self.__iter_request(url=url, endpoint='/configs', filters=filters, fields=fields, name='configs')
+
+    def iter_services(self, filters=None, fields=None):
+        url = f"{self.uri}/services"
+
+        yield from self.__iter_request(url=url, endpoint='/services', filters=filters, fields=fields,
+                                       name='services')
+
+    def iter_events(self, filters=None, since=None, until=None, timeout=None):
+        url = f"{self.uri}/events"
+
+        params = {}
+        if filters:
+            params['filters'] = filters
+        if since is not None:
+            params['since'] = f"{since:.9f}"
+        if until is not None:
+            params['until'] = f"{until:.9f}"
+
+        start = time.monotonic()
+        received = [0]
+
+        response = self.__get_request(url=url, endpoint='/events', params=params, stream=True, timeout=timeout)
+
+        try:
+            if response.status_code != 200:
+                raise ApiResponseError(f"Failed to stream events - {response.status_code}", response.status_code)
+
+            # Events are newline delimited JSON objects, written as they happen until the until time is reached
+            buffer = b''
+            for chunk in self.__iter_chunks(response, received):
+                buffer += chunk
+
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+
+                    if line.strip():
+                        yield json.loads(line.decode('utf-8'))
+
+        finally:
+            response.close()
+
+            if self.metrics is not None:
+                self.metrics.record_request('GET', '/events', response.status_code, time.monotonic() - start, 0,
+                                            received[0])
+
     def login(self):
         if self.__session_token is not None:
             return
 
+        if self.token_cache is not None:
+            cached = self.token_cache.get(self.uri, self.username)
+
+            if cached is not None:
+                self.__session_token = cached['token']
+
+                if self.__is_authenticated():
+                    return True
+
+                self.__session_token = None
+                self.token_cache.delete(self.uri, self.username)
+
         url = f"{self.uri}/id/login"
         body = {"password": self.password,
                 "username": self.username}
 
-        response = requests.post(url=url, json=body, verify=self.verify_ssl)
+        response = self.__request('POST', url=url, endpoint='/id/login', json=body)
 
         if response.status_code != 200:
             raise Exception(f"Failed to login to the UCP API at {self.endpoint} - {response.status_code}")
@@ -116,15 +220,23 @@ class UcpApi:
         else:
             raise Exception("Failed to extract login sessionToken")
 
+        if self.token_cache is not None:
+            self.token_cache.put(self.uri, self.username, token=self.__session_token)
+
         return True
 
     def logout(self):
         if self.__session_token is None:
             return
 
+        # A cached session is left open on the server so that the next run can reuse it
+        if self.token_cache is not None:
+            self.__session_token = None
+            return True
+
         url = f"{self.uri}/id/logout"
 
-        response = self.__post_request(url=url)
+        response = self.__post_request(url=url, endpoint='/id/logout')
 
         if response.status_code != 204:
             raise Exception(f"Failed to logout of the UCP API at {self.endpoint} - {response.status_code}")
@@ -136,39 +248,89 @@ class UcpApi:
     def update_certs(self, body):
         url = f"{self.uri}/api/nodes/certs"
 
-        response = self.__post_request(url=url, body=body)
+        response = self.__post_request(url=url, endpoint='/api/nodes/certs', body=body)
 
         if response.status_code != 200:
             raise Exception(f"Failed to update certs - {response.status_code}")
 
         return response
 
+    def update_interlock(self, http_port, https_port, arch):
+        url = f"{self.uri}/api/interlock"
+        body = {"HTTPPort": http_port,
+                "HTTPSPort": https_port,
+                "Arch": arch,
+                "InterlockEnabled": True}
+
+        response = self.__put_request(url=url, endpoint='/api/interlock', body=body)
+
+        if response.status_code not in [200, 204]:
+            raise Exception(f"Failed to update interlock - {response.status_code}")
+
+        return response
+
     def update_service(self, service, body):
         url = f"{self.uri}/services/{service['ID']}/update?version={service['Version']['Index']}"
 
-        response = self.__post_request(url=url, body=body)
+        response = self.__post_request(url=url, endpoint='/services/{id}/update', body=body)
 
         if response.status_code != 200:
             raise Exception(f"Failed to update service[{service['Spec']['Name']}] - {response.status_code}")
 
         return response.json()
 
-    def __delete_request(self, url):
-        return requests.delete(url=url,
-                               headers=self.__get_auth_header(),
-                               verify=self.verify_ssl)
+    def __delete_request(self, url, endpoint):
+        return self.__request('DELETE', url=url, endpoint=endpoint, headers=self.__get_auth_header())
 
-    def __get_request(self, url, params=None):
-        return requests.get(url=url,
-                            headers=self.__get_auth_header(),
-                            params=params,
-                            verify=self.verify_ssl)
+    def __get_request(self, url, endpoint, params=None, stream=False, timeout=None):
+        return self.__request('GET', url=url, endpoint=endpoint, headers=self.__get_auth_header(), params=params,
+                              stream=stream, timeout=timeout)
 
-    def __post_request(self, url, body=None):
-        return requests.post(url=url,
-                             headers=self.__get_auth_header(),
-                             json=body,
-                             verify=self.verify_ssl)
+    def __iter_request(self, url, endpoint, filters, fields, name):
+        params = None
+        if filters:
+            params = {'filters': filters}
+
+        start = time.monotonic()
+        received = [0]
+
+        response = self.__get_request(url=url, endpoint=endpoint, params=params, stream=True)
+
+        try:
+            if response.status_code != 200:
+                raise Exception(f"Failed to find {name} - {response.status_code}")
+
+            yield from JsonArrayStream(self.__iter_chunks(response, received), fields=fields)
+
+        finally:
+            response.close()
+
+            if self.metrics is not None:
+                self.metrics.record_request('GET', endpoint, response.status_code, time.monotonic() - start, 0,
+                                            received[0])
+
+    def __iter_chunks(self, response, received):
+        for chunk in response.iter_content(chunk_size=65536):
+            received[0] += len(chunk)
+            yield chunk
+
+    def __post_request(self, url, endpoint, body=None):
+        return self.__request('POST', url=url, endpoint=endpoint, headers=self.__get_auth_header(), json=body)
+
+    def __put_request(self, url, endpoint, body=None):
+        return self.__request('PUT', url=url, endpoint=endpoint, headers=self.__get_auth_header(), json=body)
+
+    def __request(self, method, url, endpoint, **kwargs):
+        start = time.monotonic()
+
+        response = self.session.request(method, url=url, verify=self.verify_ssl, **kwargs)
+
+        # Streamed responses are accounted for once they have been consumed
+        if self.metrics is not None and not kwargs.get('stream'):
+            self.metrics.record_request(method, endpoint, response.status_code, time.monotonic() - start,
+                                        len(response.request.body or b''), len(response.content))
+
+        return response
 
     def __get_auth_header(self):
         return {'Authorization': f"Bearer {self.__session_token}"}
@@ -176,7 +338,7 @@ class UcpApi:
     def __is_authenticated(self):
         url = f"{self.uri}/id"
 
-        response = self.__get_request(url=url)
+        response = self.__get_request(url=url, endpoint='/id')
 
         if response.status_code != 200:
             return False
@@ -0,0 +1,21 @@
+def config_number(name, prefix):
+    if not name.startswith(f"{prefix}-"):
+        return None
+
+    suffix = name[len(prefix) + 1:]
+
+    return int(suffix) if suffix.isdigit() else None
+
+
+def latest_config(configs, prefix):
+    latest = None
+    latest_number = None
+
+    for config in configs:
+        number = config_number(config['Spec']['Name'], prefix)
+
+        if number is not None and (latest_number is None or number > latest_number):
+            latest = config
+            latest_number = number
+
+    return latest
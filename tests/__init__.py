@@ -0,0 +1,6 @@
+import os
+import sys
+
+path = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.insert(0, os.path.realpath(f"{path}/../dry-dock/lib"))
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from cert_lineage_index import CertLineageIndex
+
+
+class CertLineageIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_dir = self.temp_dir.name
+
+        os.makedirs(f"{self.config_dir}/renewal")
+
+        self.index = CertLineageIndex(self.config_dir)
+
+        return
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+        return
+
+    def write_lineage(self, name, live_dir=None):
+        live_dir = live_dir or f"{self.config_dir}/live/{name}"
+
+        os.makedirs(live_dir, exist_ok=True)
+        for key in ['cert', 'privkey', 'chain', 'fullchain']:
+            open(f"{live_dir}/{key}.pem", 'w').close()
+
+        with open(f"{self.config_dir}/renewal/{name}.conf", 'w') as renewal_file:
+            renewal_file.write(f"# renew_before_expiry = 30 days\n"
+                               f"version = 0.31.0\n"
+                               f"cert = {live_dir}/cert.pem\n"
+                               f"privkey = {live_dir}/privkey.pem\n"
+                               f"chain = {live_dir}/chain.pem\n"
+                               f"fullchain = {live_dir}/fullchain.pem\n"
+                               f"\n"
+                               f"[renewalparams]\n"
+                               f"cert = /elsewhere/cert.pem\n")
+
+        # The index only rebuilds when the renewal directory mtime changes, which can be too coarse within a test
+        stat = os.stat(f"{self.config_dir}/renewal")
+        os.utime(f"{self.config_dir}/renewal", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        return live_dir
+
+    def test_reads_top_level_paths(self):
+        live_dir = self.write_lineage('ucp.example.com', live_dir=f"{self.config_dir}/archive-live/ucp")
+
+        lineage = self.index.lineage('ucp.example.com')
+
+        self.assertEqual(lineage['name'], 'ucp.example.com')
+        self.assertEqual(lineage['live_dir'], live_dir)
+        self.assertEqual(lineage['cert'], f"{live_dir}/cert.pem")
+        self.assertEqual(lineage['fullchain'], f"{live_dir}/fullchain.pem")
+
+    def test_falls_back_to_live_directory_for_moved_paths(self):
+        self.write_lineage('ucp.example.com')
+
+        with open(f"{self.config_dir}/renewal/ucp.example.com.conf", 'w') as renewal_file:
+            renewal_file.write("fullchain = /moved/live/ucp.example.com/fullchain.pem\n")
+
+        self.assertEqual(self.index.cert_directory('ucp.example.com'), f"{self.config_dir}/live/ucp.example.com")
+        self.assertEqual(self.index.lineage('ucp.example.com')['privkey'],
+                         f"{self.config_dir}/live/ucp.example.com/privkey.pem")
+
+    def test_prefers_highest_suffix(self):
+        self.write_lineage('ucp.example.com')
+        self.write_lineage('ucp.example.com-0002')
+        self.write_lineage('ucp.example.com-0001')
+
+        self.assertEqual(self.index.lineage('ucp.example.com')['name'], 'ucp.example.com-0002')
+
+    def test_does_not_match_other_names_with_the_same_prefix(self):
+        self.write_lineage('ucp.example.com-old')
+        self.write_lineage('ucp.example.com.bak')
+        self.write_lineage('ucp.example.com-00012')
+
+        self.assertIsNone(self.index.lineage('ucp.example.com'))
+        self.assertEqual(self.index.lineage('ucp.example.com-old')['name'], 'ucp.example.com-old')
+
+    def test_refreshes_when_renewal_directory_changes(self):
+        self.write_lineage('ucp.example.com')
+
+        self.assertTrue(self.index.refresh())
+        self.assertFalse(self.index.refresh())
+
+        self.write_lineage('ucp.example.com-0001')
+
+        self.assertEqual(self.index.lineage('ucp.example.com')['name'], 'ucp.example.com-0001')
+
+    def test_missing_renewal_directory(self):
+        index = CertLineageIndex(f"{self.config_dir}/missing")
+
+        self.assertIsNone(index.lineage('ucp.example.com'))
+        self.assertIsNone(index.cert_directory('ucp.example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from cert_planner import CertPlanner
+
+
+def request(conf_dir, component, domain_name, sans=None):
+    return {'conf_dir': conf_dir,
+            'component': component,
+            'domain_name': domain_name,
+            'domains': set([domain_name] + (sans or []))}
+
+
+class CertPlannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cert_planner = CertPlanner(conf_dirs=[])
+
+        return
+
+    def test_narrower_requests_join_the_certificate_that_covers_them(self):
+        certificates = self.cert_planner.group([request('a', 'ucp', 'ucp.example.com'),
+                                                request('b', 'ucp', 'ucp.example.com', ['ucp-b.example.com']),
+                                                request('a', 'dtr', 'dtr.example.com')])
+
+        self.assertEqual(len(certificates), 2)
+
+        ucp = next(certificate for certificate in certificates if certificate['domain_name'] == 'ucp.example.com')
+        self.assertEqual(ucp['cert_name'],
+                         CertPlanner.cert_name('ucp.example.com', {'ucp.example.com', 'ucp-b.example.com'}))
+        self.assertEqual(ucp['domains'], ['ucp.example.com', 'ucp-b.example.com'])
+        self.assertEqual(ucp['issuer'], 'b')
+        self.assertEqual(ucp['targets'], [('b', 'ucp'), ('a', 'ucp')])
+
+    def test_identical_requests_share_one_certificate(self):
+        certificates = self.cert_planner.group([request('a', 'ucp', 'ucp.example.com'),
+                                                request('b', 'ucp', 'ucp.example.com')])
+
+        self.assertEqual(len(certificates), 1)
+        self.assertEqual(certificates[0]['targets'], [('a', 'ucp'), ('b', 'ucp')])
+
+    def test_overlapping_requests_get_unique_names(self):
+        certificates = self.cert_planner.group([request('a', 'ucp', 'ucp.example.com', ['a.example.com']),
+                                                request('b', 'ucp', 'ucp.example.com', ['b.example.com']),
+                                                request('c', 'ucp', 'ucp.example.com', ['c.example.com']),
+                                                request('d', 'ucp', 'ucp.example.com', ['d.example.com'])])
+
+        names = [certificate['cert_name'] for certificate in certificates]
+
+        self.assertEqual(len(set(names)), 4)
+        self.assertTrue(all(name.startswith('ucp.example.com_') for name in names))
+
+    def test_names_do_not_depend_on_other_clusters(self):
+        requests = [request('b', 'ucp', 'ucp.example.com', ['b.example.com']),
+                    request('c', 'ucp', 'ucp.example.com', ['c.example.com'])]
+
+        names = dict((certificate['issuer'], certificate['cert_name'])
+                     for certificate in self.cert_planner.group(requests))
+        more_names = dict((certificate['issuer'], certificate['cert_name'])
+                          for certificate in self.cert_planner.group([request('a', 'ucp', 'ucp.example.com',
+                                                                              ['a.example.com'])] + requests))
+
+        self.assertEqual(names['b'], more_names['b'])
+        self.assertEqual(names['c'], more_names['c'])
+
+    def test_primary_domain_comes_first(self):
+        certificates = self.cert_planner.group([request('a', 'ucp', 'z.example.com', ['a.example.com'])])
+
+        self.assertEqual(certificates[0]['domains'], ['z.example.com', 'a.example.com'])
+
+    def test_cert_name_depends_on_the_domain_set_only(self):
+        name = CertPlanner.cert_name('ucp.example.com', {'ucp.example.com', 'a.example.com'})
+
+        self.assertEqual(name, CertPlanner.cert_name('ucp.example.com', ['a.example.com', 'ucp.example.com']))
+        self.assertNotEqual(name, CertPlanner.cert_name('ucp.example.com', {'ucp.example.com', 'b.example.com'}))
+        self.assertRegex(name, r'^ucp\.example\.com_[0-9a-f]{8}$')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from http_session import HttpSession
+
+
+def pool_maxsize(session, url):
+    return session.get_adapter(url)._pool_maxsize
+
+
+class HttpSessionTest(unittest.TestCase):
+
+    def test_reserve_grows_the_shared_pool(self):
+        session = HttpSession.shared()
+        size = pool_maxsize(session, 'https://ucp.example.com')
+
+        HttpSession.reserve(size + 5)
+
+        self.assertIs(HttpSession.shared(), session)
+        self.assertEqual(pool_maxsize(session, 'https://ucp.example.com'), size + 5)
+        self.assertEqual(pool_maxsize(session, 'http://ucp.example.com'), size + 5)
+
+    def test_reserve_never_shrinks_the_shared_pool(self):
+        session = HttpSession.shared()
+        size = pool_maxsize(session, 'https://ucp.example.com')
+
+        HttpSession.reserve(1)
+
+        self.assertEqual(pool_maxsize(session, 'https://ucp.example.com'), size)
+
+
+if __name__ == '__main__':
+    unittest.main()
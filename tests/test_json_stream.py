@@ -0,0 +1,49 @@
+import json
+import unittest
+
+from json_stream import JsonArrayStream
+
+
+def parse(chunks, fields=None):
+    return list(JsonArrayStream(chunks, fields=fields))
+
+
+class JsonArrayStreamTest(unittest.TestCase):
+
+    def test_parses_like_json_loads(self):
+        text = ' [ {"ID": "a", "Spec": {"Name": "x"}} , 1, -2.5e3, "s,]", true, null, [] ]\n'
+
+        self.assertEqual(parse([text]), json.loads(text))
+
+    def test_entries_split_across_chunks(self):
+        text = '[{"ID": "abc"}, 12345, "été", false]'
+        data = text.encode('utf-8')
+
+        for split in range(1, len(data)):
+            self.assertEqual(parse([data[:split], data[split:]]), json.loads(text), split)
+
+    def test_empty_array(self):
+        self.assertEqual(parse(['[', ' ', ']']), [])
+
+    def test_projects_fields(self):
+        entries = parse(['[{"ID": "a", "Spec": {"Name": "x", "Labels": {}}, "Version": 1}]'],
+                        fields=['ID', 'Spec.Name', 'Missing'])
+
+        self.assertEqual(entries, [{'ID': 'a', 'Spec': {'Name': 'x'}}])
+
+    def test_rejects_malformed_separators(self):
+        for text in ['[1,,2]', '[1 2]', '[,1]', '[1,]', '[1;2]', '[{"a": 1}{"b": 2}]']:
+            with self.assertRaises(ValueError, msg=text):
+                parse([text])
+
+            with self.assertRaises(ValueError, msg=text):
+                json.loads(text)
+
+    def test_rejects_truncated_array(self):
+        for text in ['[1, 2', '[{"a": 1}', '{"a": 1}']:
+            with self.assertRaises(ValueError, msg=text):
+                parse([text])
+
+
+if __name__ == '__main__':
+    unittest.main()
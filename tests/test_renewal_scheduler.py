@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from file_lock import FileLock
+from renewal_scheduler import DAY, RenewalScheduler, registered_domain
+
+
+class RegisteredDomainTest(unittest.TestCase):
+
+    def test_last_two_labels(self):
+        self.assertEqual(registered_domain('ucp.cluster1.Example.com'), 'example.com')
+        self.assertEqual(registered_domain('example.com'), 'example.com')
+
+    def test_wildcard(self):
+        self.assertEqual(registered_domain('*.apps.example.com'), 'example.com')
+
+
+class RenewalSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue_path = f"{self.temp_dir.name}/renewal-queue.json"
+
+        self.renewal_scheduler = RenewalScheduler(queue_path=self.queue_path, conf_dirs=[], window_days=7,
+                                                  registered_domain_limit=2, registered_domain_period=7 * DAY,
+                                                  global_limit=3, global_period=3 * 3600, logger=mock.Mock())
+
+        return
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+        return
+
+    def test_schedule_is_stable_and_within_the_window(self):
+        not_after = 1000 * DAY
+
+        scheduled = self.renewal_scheduler.schedule('cluster1/ucp', not_after, 30)
+
+        self.assertEqual(scheduled, self.renewal_scheduler.schedule('cluster1/ucp', not_after, 30))
+        self.assertGreaterEqual(scheduled, not_after - 30 * DAY)
+        self.assertLessEqual(scheduled, not_after - 23 * DAY)
+
+    def test_schedule_spreads_certificates_that_expire_together(self):
+        not_after = 1000 * DAY
+
+        scheduled = set(self.renewal_scheduler.schedule(f"cluster{number}/ucp", not_after, 30)
+                        for number in range(20))
+
+        self.assertEqual(len(scheduled), 20)
+
+    def test_schedule_window_is_at_most_half_the_renewal_period(self):
+        not_after = 1000 * DAY
+
+        for number in range(20):
+            scheduled = self.renewal_scheduler.schedule(f"cluster{number}/ucp", not_after, 4)
+
+            self.assertLessEqual(scheduled, not_after - 2 * DAY)
+
+    def test_budget_available(self):
+        entry = {'domains': ['ucp.example.com']}
+        orders = [{'time': 0, 'registered_domains': ['example.com']}]
+
+        self.assertIsNone(self.renewal_scheduler.exhausted_budget(orders, entry, 10 * DAY))
+
+    def test_global_budget_exhausted(self):
+        now = 10 * DAY
+        entry = {'domains': ['ucp.example.com']}
+        orders = [{'time': now - 60, 'registered_domains': [f"example{number}.com"]} for number in range(3)]
+
+        self.assertEqual(self.renewal_scheduler.exhausted_budget(orders, entry, now), 'global')
+        self.assertIsNone(self.renewal_scheduler.exhausted_budget(orders, entry, now + 3 * 3600))
+
+    def test_registered_domain_budget_exhausted(self):
+        now = 10 * DAY
+        entry = {'domains': ['ucp.example.com', 'dtr.example.org']}
+        orders = [{'time': now - DAY, 'registered_domains': ['example.org']},
+                  {'time': now - 2 * DAY, 'registered_domains': ['example.com', 'example.org']}]
+
+        self.assertEqual(self.renewal_scheduler.exhausted_budget(orders, entry, now), 'example.org')
+        self.assertIsNone(self.renewal_scheduler.exhausted_budget(orders, entry, now + 6 * DAY))
+
+    def test_refresh_prunes_removed_conf_dirs(self):
+        queue = {'entries': {'kept/ucp': {'conf_dir': 'kept'}, 'removed/ucp': {'conf_dir': 'removed'}},
+                 'orders': []}
+
+        with mock.patch.object(RenewalScheduler, 'conf_dir_exists', side_effect=lambda conf_dir: conf_dir == 'kept'):
+            self.renewal_scheduler.refresh(queue)
+
+        self.assertEqual(list(queue['entries']), ['kept/ucp'])
+
+    def test_run_is_skipped_while_another_run_holds_the_lock(self):
+        with FileLock(f"{self.queue_path}.lock"):
+            self.assertEqual(self.renewal_scheduler.run(), [])
+
+        self.assertFalse(os.path.exists(self.queue_path))
+
+
+class FileLockTest(unittest.TestCase):
+
+    def test_non_blocking_lock_is_refused_while_held(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = f"{temp_dir}/test.lock"
+
+            with FileLock(path):
+                with self.assertRaises(BlockingIOError):
+                    FileLock(path, blocking=False).acquire()
+
+            with FileLock(path, blocking=False) as file_lock:
+                self.assertIsNotNone(file_lock.descriptor)
+
+
+if __name__ == '__main__':
+    unittest.main()